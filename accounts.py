@@ -0,0 +1,226 @@
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from reader import BlockReader
+from utils.file import get_account_index_file
+
+# An inverted index from accounts to the transactions that touched them, with
+# their balances before and after, over every epoch indexed in a data dir.
+# Balances are clustered by account, so the history of an account is read in
+# time proportional to its activity. Blocks are indexed once, and again only
+# when they are rewritten.
+
+INDEX_COMMIT_BLOCKS = 1000
+
+
+class AccountIndex:
+    def __init__(self, index_file: Path):
+        self._db = sqlite3.connect(index_file, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS pubkeys ("
+            "id INTEGER PRIMARY KEY, pubkey TEXT UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS transactions ("
+            "slot INTEGER, tx_index INTEGER, signature TEXT, "
+            "PRIMARY KEY (slot, tx_index)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS balances ("
+            "account INTEGER, slot INTEGER, tx_index INTEGER, key_index INTEGER, "
+            "pre_balance INTEGER, post_balance INTEGER, "
+            "writable INTEGER, signer INTEGER, "
+            "PRIMARY KEY (account, slot, tx_index, key_index)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS balances_slot ON balances (slot);"
+            "CREATE TABLE IF NOT EXISTS indexed ("
+            "slot INTEGER PRIMARY KEY, epoch INTEGER, fingerprint TEXT);"
+        )
+        self._db.commit()
+        self._pubkey_ids = {}
+
+    def _pubkey_id(self, pubkey: str):
+        if pubkey not in self._pubkey_ids:
+            self._db.execute(
+                "INSERT OR IGNORE INTO pubkeys (pubkey) VALUES (?)", (pubkey,)
+            )
+            (self._pubkey_ids[pubkey],) = self._db.execute(
+                "SELECT id FROM pubkeys WHERE pubkey = ?", (pubkey,)
+            ).fetchone()
+        return self._pubkey_ids[pubkey]
+
+    def fingerprints(self, epoch: int):
+        return dict(
+            self._db.execute(
+                "SELECT slot, fingerprint FROM indexed WHERE epoch = ?", (epoch,)
+            )
+        )
+
+    def remove_block(self, slot: int):
+        self._db.execute("DELETE FROM balances WHERE slot = ?", (slot,))
+        self._db.execute("DELETE FROM transactions WHERE slot = ?", (slot,))
+        self._db.execute("DELETE FROM indexed WHERE slot = ?", (slot,))
+
+    def add_blocks(self, epoch: int, compact, fingerprints):
+        # rewritten blocks replace everything indexed from them before
+        for slot in fingerprints:
+            self.remove_block(slot)
+
+        # ids of the epoch key dictionary to those of the index, which spans
+        # every epoch
+        key_ids = np.unique(compact.accounts)
+        pubkey_ids = np.zeros(len(compact.keys), dtype=np.int64)
+        pubkey_ids[key_ids] = [
+            self._pubkey_id(compact.keys.key(key_id)) for key_id in key_ids.tolist()
+        ]
+
+        tx_indexes = compact.tx_indexes()
+        account_tx = compact.account_tx
+        self._db.executemany(
+            "INSERT INTO transactions VALUES (?, ?, ?)",
+            zip(compact.tx_slots.tolist(), tx_indexes.tolist(), compact.signatures),
+        )
+        self._db.executemany(
+            "INSERT INTO balances VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                pubkey_ids[compact.accounts].tolist(),
+                compact.tx_slots[account_tx].tolist(),
+                tx_indexes[account_tx].tolist(),
+                compact.key_indexes().tolist(),
+                compact.pre_balances.tolist(),
+                compact.post_balances.tolist(),
+                compact.writable.tolist(),
+                compact.signer.tolist(),
+            ),
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO indexed VALUES (?, ?, ?)",
+            [(slot, epoch, fingerprint) for slot, fingerprint in fingerprints.items()],
+        )
+
+    def history(
+        self,
+        pubkey: str,
+        low_slot: Optional[int] = None,
+        up_slot: Optional[int] = None,
+    ):
+        # (slot, signature, pre balance, post balance, writable, signer) of
+        # every transaction of the account, oldest first
+        row = self._db.execute(
+            "SELECT id FROM pubkeys WHERE pubkey = ?", (pubkey,)
+        ).fetchone()
+        if row is None:
+            return []
+        rows = self._db.execute(
+            "SELECT b.slot, t.signature, b.pre_balance, b.post_balance, "
+            "b.writable, b.signer FROM balances b JOIN transactions t "
+            "ON t.slot = b.slot AND t.tx_index = b.tx_index "
+            "WHERE b.account = ? AND b.slot BETWEEN ? AND ? "
+            "ORDER BY b.slot, b.tx_index, b.key_index",
+            (
+                row[0],
+                low_slot if low_slot is not None else -1,
+                up_slot if up_slot is not None else 2**62,
+            ),
+        )
+        return [
+            (slot, signature, pre_balance, post_balance, bool(writable), bool(signer))
+            for slot, signature, pre_balance, post_balance, writable, signer in rows
+        ]
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def index_accounts(data_dir: Path, epoch: int, slot_range=None):
+    reader = BlockReader(data_dir, epoch)
+    with AccountIndex(get_account_index_file(data_dir)) as index:
+        fingerprints = index.fingerprints(epoch)
+        if slot_range is None:
+            present = reader.manifest.present.nonzero()[0]
+            slot_range = (present + reader.manifest.first_slot).tolist()
+            slot_range = sorted(set(slot_range) | set(fingerprints))
+
+        stale = {}
+        for slot in slot_range:
+            if not reader.exists(slot):
+                # blocks of abandoned forks are deleted by the follower
+                if slot in fingerprints:
+                    index.remove_block(slot)
+                continue
+            fingerprint = reader.fingerprint(slot)
+            if fingerprints.get(slot) != fingerprint:
+                stale[slot] = fingerprint
+
+        # blocks are indexed from their compact columns, a chunk at a time
+        stale_slots = sorted(stale)
+        for offset in tqdm(range(0, len(stale_slots), INDEX_COMMIT_BLOCKS)):
+            chunk = stale_slots[offset : offset + INDEX_COMMIT_BLOCKS]
+            compact = reader.read_compact(chunk, instructions=False, save_keys=True)
+            index.add_blocks(epoch, compact, {slot: stale[slot] for slot in chunk})
+            index.commit()
+    return len(stale)
+
+
+def get_account_history(data_dir: Path, pubkey: str, slot_range=None):
+    with AccountIndex(get_account_index_file(data_dir)) as index:
+        if slot_range is None:
+            return index.history(pubkey)
+        return index.history(pubkey, slot_range[0], slot_range[1] - 1)
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument("--data-dir", type=str, required=True)
+    CLI.add_argument("--epochs", nargs="+", type=int)
+    CLI.add_argument("--pubkey", type=str)
+    CLI.add_argument(
+        "--slot-range",
+        nargs=2,
+        type=int,
+    )
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    data_dir = Path(args.data_dir)
+    for epoch in args.epochs or []:
+        index_accounts(
+            data_dir,
+            epoch,
+            list(range(*args.slot_range)) if args.slot_range else None,
+        )
+
+    if args.pubkey:
+        for (
+            slot,
+            signature,
+            pre_balance,
+            post_balance,
+            writable,
+            signer,
+        ) in get_account_history(data_dir, args.pubkey, args.slot_range):
+            print(
+                json.dumps(
+                    {
+                        "slot": slot,
+                        "signature": signature,
+                        "pre_balance": pre_balance,
+                        "post_balance": post_balance,
+                        "writable": writable,
+                        "signer": signer,
+                    }
+                )
+            )
@@ -1,71 +1,46 @@
 import argparse
 import json
-from collections import defaultdict
 from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.lines import Line2D
-from tqdm import tqdm
 
 from bpc import dbscan_cluster_vote_behavior
-from models import Block
+from scan import (
+    RentAggregator,
+    TransactionsAggregator,
+    VoteAggregator,
+    scan,
+    scan_vote_table,
+)
+from utils.columnar import get_rent, get_transaction_counts, has_columnar_store
 from utils.constants import *
-from utils.file import get_block_file, get_leader_schedule_file
+from utils.file import get_skipped_slots_file
+from utils.manifest import load_manifest
 from utils.plot import plot_bars
+from utils.schedule import load_leader_schedule
+from votes import read_covering_vote_table
 
 
-def get_vote_behavior(data_dir, epoch, slot_range):
-    votes = {}
-    for i, slot in tqdm(enumerate(slot_range)):
-        block_file = get_block_file(data_dir, epoch, slot)
-        if block_file.exists():
-            block = Block.from_json(block_file)
-            for validator in votes:
-                votes[validator][VOTES].append(votes[validator][VOTES][-1])
-
-            for vote in [
-                tr_inst.data[INFO]
-                for tr in block.transactions
-                for tr_inst in tr.transaction_instructions
-                if tr.err is None
-                and tr_inst.program_account == VOTE_PROGRAM_ACCOUNT
-                and tr_inst.data[TYPE] == VOTE
-            ]:
-                authority = vote[VOTE_AUTHORITY]
-                vote_slot = vote[VOTE][SLOTS][-1]
-                if authority not in votes:
-                    votes[authority] = {FIRST_VOTE: i + 1, VOTES: [vote_slot]}
-                else:
-                    votes[authority][VOTES][-1] = vote_slot
-
-    return votes
-
-
-def plot_rent_collected(data_dir, epoch, slot_range):
-    rent = {}
-    given = {}
-    for slot in tqdm(slot_range):
-        block_file = get_block_file(data_dir, epoch, slot)
-        if block_file.exists():
-            block: Block = Block.from_json(block_file)
-            rent[slot] = sum(
-                [
-                    -rw[LAMPORTS]
-                    for rw in block.rewards
-                    if rw[REWARD_TYPE] == RENT and rw[LAMPORTS] < 0
-                ]
-            )
-            given[slot] = sum(
-                [
-                    rw[LAMPORTS]
-                    for rw in block.rewards
-                    if rw[REWARD_TYPE] == RENT and rw[LAMPORTS] > 0
-                ]
-            )
-        else:
-            rent[slot] = 0
-            given[slot] = 0
+def get_vote_behavior(data_dir, epoch, slot_range, workers=1, cache=True):
+    vote_table = read_covering_vote_table(data_dir, epoch, slot_range)
+    if vote_table is not None:
+        return scan_vote_table(vote_table, slot_range, VoteAggregator())
+    return scan(data_dir, epoch, slot_range, [VoteAggregator()], workers, cache)[0]
+
+
+def get_rent_collected(data_dir, epoch, slot_range, workers=1, cache=True):
+    if has_columnar_store(data_dir, epoch, slot_range):
+        return get_rent(data_dir, epoch, slot_range)
+
+    return scan(data_dir, epoch, slot_range, [RentAggregator()], workers, cache)[0]
+
+
+def plot_rent_collected(data_dir, epoch, slot_range, rent_collected=None):
+    if rent_collected is None:
+        rent_collected = get_rent_collected(data_dir, epoch, slot_range)
+    rent, given = rent_collected
 
     _, ax = plt.subplots(1, 1)
 
@@ -97,18 +72,19 @@ def plot_rent_collected(data_dir, epoch, slot_range):
     plt.show()
 
 
-def plot_number_of_transactions(data_dir, epoch, slot_range):
-    total = {}
-    fail = {}
-    for slot in tqdm(slot_range):
-        block_file = get_block_file(data_dir, epoch, slot)
-        if block_file.exists():
-            block: Block = Block.from_json(block_file)
-            total[slot] = len(block.transactions)
-            fail[slot] = len([tr for tr in block.transactions if tr.err is not None])
-        else:
-            total[slot] = 0
-            fail[slot] = 0
+def get_number_of_transactions(data_dir, epoch, slot_range, workers=1, cache=True):
+    if has_columnar_store(data_dir, epoch, slot_range):
+        return get_transaction_counts(data_dir, epoch, slot_range)
+
+    return scan(
+        data_dir, epoch, slot_range, [TransactionsAggregator()], workers, cache
+    )[0]
+
+
+def plot_number_of_transactions(data_dir, epoch, slot_range, transactions=None):
+    if transactions is None:
+        transactions = get_number_of_transactions(data_dir, epoch, slot_range)
+    total, fail = transactions
 
     _, ax = plt.subplots(1, 1)
     labels = np.array(slot_range)
@@ -140,15 +116,10 @@ def plot_number_of_transactions(data_dir, epoch, slot_range):
 
 
 def plot_leaders_pie_chart(data_dir, epoch, other_share=1 / 3):
-    schedule = json.loads(get_leader_schedule_file(data_dir, epoch).read_text())
-    data = []
-    total = 0
-    for pubkey, slots in schedule.items():
-        n = len(slots)
-        data.append((n, pubkey))
-        total += n
-
-    data.sort(reverse=True)
+    schedule = load_leader_schedule(data_dir, epoch)
+    counts = schedule.counts()
+    total = int(counts.sum())
+    data = sorted(zip(counts.tolist(), schedule.pubkeys), reverse=True)
 
     labels = []
     fracs = []
@@ -169,23 +140,28 @@ def plot_leaders_pie_chart(data_dir, epoch, other_share=1 / 3):
     plt.show()
 
 
-def plot_validator_block_production(data_dir, epoch, slot_range):
-    schedule = json.loads(get_leader_schedule_file(data_dir, epoch).read_text())
-    schedule_inv = {
-        slot: pubkey for pubkey, slots in schedule.items() for slot in slots
-    }
-    total = defaultdict(int)
-    missed = defaultdict(int)
+def get_skipped_slots(data_dir, epoch, slot_range):
+    skipped_slots_file = get_skipped_slots_file(data_dir, epoch)
+    if skipped_slots_file.exists():
+        return set(json.loads(skipped_slots_file.read_text()))
+    return load_manifest(data_dir, epoch).missing(slot_range)
+
 
-    existing_blocks = set()
-    for slot in tqdm(slot_range):
-        if get_block_file(data_dir, epoch, slot).exists():
-            existing_blocks.add(slot)
+def get_block_production(data_dir, epoch, slot_range, skipped_slots=None):
+    schedule = load_leader_schedule(data_dir, epoch)
+    if skipped_slots is None:
+        skipped_slots = get_skipped_slots(data_dir, epoch, slot_range)
 
-    for slot in slot_range:
-        total[schedule_inv[slot]] += 1
-        if slot not in existing_blocks:
-            missed[schedule_inv[slot]] += 1
+    counts = schedule.counts(slot_range)
+    missed_counts = schedule.missed(slot_range, skipped_slots)
+    leaders = np.flatnonzero(counts)
+    total = {schedule.pubkeys[i]: counts[i] for i in leaders}
+    missed = {schedule.pubkeys[i]: missed_counts[i] for i in leaders}
+    return total, missed
+
+
+def plot_validator_block_production(data_dir, epoch, slot_range, skipped_slots=None):
+    total, missed = get_block_production(data_dir, epoch, slot_range, skipped_slots)
 
     _, ax = plt.subplots(1, 1)
     # labels = np.array(list(total.keys()))
@@ -217,16 +193,18 @@ def plot_validator_block_production(data_dir, epoch, slot_range):
     plt.show()
 
 
-def plot_validators_voting(data_dir, epoch, slot_range, validators):
-    votes = get_vote_behavior(data_dir, epoch, slot_range)
+def plot_validators_voting(data_dir, epoch, slot_range, validators, votes=None):
+    if votes is None:
+        votes = get_vote_behavior(data_dir, epoch, slot_range)
 
     _, ax = plt.subplots(1, 1)
     for validator in validators:
-        first_vote = votes[validator][FIRST_VOTE]
-        validator_votes = votes[validator][VOTES]
+        row = votes.index(validator)
+        first_vote = votes.first_votes[row]
+        validator_votes = votes.series(row)
         ax.plot(
-            range(first_vote, first_vote + len(validator_votes)),
-            [vote - slot_range[0] for vote in validator_votes],
+            np.arange(first_vote, first_vote + len(validator_votes)),
+            validator_votes - slot_range[0],
             label=f"{validator[:10]}...",
         )
 
@@ -236,27 +214,39 @@ def plot_validators_voting(data_dir, epoch, slot_range, validators):
     plt.show()
 
 
-def plot_voting_outlier_behavior(data_dir, epoch, slot_range, sensibility=2):
-    votes = get_vote_behavior(data_dir, epoch, slot_range)
-    validators = list(votes.keys())[:100]
-
-    first_votes = [votes[pubkey][FIRST_VOTE] for pubkey in validators]
-    votes = [votes[pubkey][VOTES] for pubkey in validators]
-
-    labels = dbscan_cluster_vote_behavior(votes, sensibility=sensibility)
-    for validator_votes, first_vote, cl in zip(votes, first_votes, labels):
-        if cl == -1:
-            plt.plot(
-                range(first_vote, first_vote + len(validator_votes)),
-                [vote - slot_range[0] for vote in validator_votes],
-                color="red",
-            )
-        else:
-            plt.plot(
-                range(first_vote, first_vote + len(validator_votes)),
-                [vote - slot_range[0] for vote in validator_votes],
-                color="blue",
-            )
+def plot_voting_outlier_behavior(
+    data_dir,
+    epoch,
+    slot_range,
+    sensibility=2,
+    votes=None,
+    max_validators=None,
+    window=None,
+    workers=1,
+    cluster_mode="dense",
+):
+    if votes is None:
+        votes = get_vote_behavior(data_dir, epoch, slot_range, workers)
+    rows = range(len(votes))
+    if max_validators is not None:
+        rows = range(min(len(votes), max_validators))
+
+    first_votes = votes.first_votes[rows]
+    series = [votes.series(row) for row in rows]
+
+    labels = dbscan_cluster_vote_behavior(
+        series,
+        sensibility=sensibility,
+        window=window,
+        workers=workers,
+        pruned=cluster_mode == "pruned",
+    )
+    for validator_votes, first_vote, cl in zip(series, first_votes, labels):
+        plt.plot(
+            np.arange(first_vote, first_vote + len(validator_votes)),
+            validator_votes - slot_range[0],
+            color="red" if cl == -1 else "blue",
+        )
 
     plt.xlabel("slot")
     plt.ylabel("max slot voted")
@@ -269,10 +259,35 @@ def plot_voting_outlier_behavior(data_dir, epoch, slot_range, sensibility=2):
     plt.show()
 
 
+def scan_for_plots(data_dir, epoch, slot_range, plots, workers=1, cache=True):
+    # every plot needing blocks is fed from one pass over the slot range
+    aggregators = {}
+    results = {}
+    columnar = has_columnar_store(data_dir, epoch, slot_range)
+    if "rent" in plots and not columnar:
+        aggregators["rent"] = RentAggregator()
+    if "transactions" in plots and not columnar:
+        aggregators["transactions"] = TransactionsAggregator()
+    if "votes" in plots or "outliers" in plots:
+        vote_table = read_covering_vote_table(data_dir, epoch, slot_range)
+        if vote_table is None:
+            aggregators["votes"] = VoteAggregator()
+        else:
+            results["votes"] = scan_vote_table(vote_table, slot_range, VoteAggregator())
+
+    if aggregators:
+        scanned = scan(
+            data_dir, epoch, slot_range, list(aggregators.values()), workers, cache
+        )
+        results.update(zip(aggregators, scanned))
+    return results
+
+
 if __name__ == "__main__":
     CLI = argparse.ArgumentParser()
     CLI.add_argument(
         "plot",
+        nargs="+",
         choices=["rent", "transactions", "leaders", "production", "votes", "outliers"],
     )
     CLI.add_argument("--data-dir", type=str, required=True)
@@ -301,46 +316,86 @@ if __name__ == "__main__":
         type=int,
         default=2,
     )
+    CLI.add_argument(
+        "--max-validators",
+        type=int,
+    )
+    CLI.add_argument(
+        "--window",
+        type=int,
+    )
+    CLI.add_argument(
+        "--cluster-mode",
+        choices=["dense", "pruned"],
+        default="dense",
+    )
+    CLI.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+    )
+
+    CLI.add_argument(
+        "--no-cache",
+        action="store_true",
+    )
 
     # parse the command line
     args = CLI.parse_args()
 
-    if args.plot == "rent":
-        plot_rent_collected(
-            Path(args.data_dir),
-            args.epoch,
-            list(range(*args.slot_range)),
-        )
-    elif args.plot == "transactions":
-        plot_number_of_transactions(
-            Path(args.data_dir),
-            args.epoch,
-            list(range(*args.slot_range)),
-        )
-    elif args.plot == "leaders":
-        plot_leaders_pie_chart(
-            Path(args.data_dir), args.epoch, other_share=args.other_share
-        )
-    elif args.plot == "production":
-        plot_validator_block_production(
-            Path(args.data_dir),
-            args.epoch,
-            list(range(*args.slot_range)),
-        )
-    elif args.plot == "votes":
-        plot_validators_voting(
-            Path(args.data_dir),
-            args.epoch,
-            list(range(*args.slot_range)),
-            args.validators,
-        )
-    elif args.plot == "outliers":
+    data_dir = Path(args.data_dir)
+    slot_range = list(range(*args.slot_range))
+    results = scan_for_plots(
+        data_dir,
+        args.epoch,
+        slot_range,
+        args.plot,
+        workers=args.workers,
+        cache=not args.no_cache,
+    )
 
-        plot_voting_outlier_behavior(
-            Path(args.data_dir),
-            args.epoch,
-            list(range(*args.slot_range)),
-            sensibility=args.sensibility,
-        )
-    else:
-        raise Exception("Invalid operation")
+    for plot in args.plot:
+        if plot == "rent":
+            plot_rent_collected(
+                data_dir,
+                args.epoch,
+                slot_range,
+                rent_collected=results.get("rent"),
+            )
+        elif plot == "transactions":
+            plot_number_of_transactions(
+                data_dir,
+                args.epoch,
+                slot_range,
+                transactions=results.get("transactions"),
+            )
+        elif plot == "leaders":
+            plot_leaders_pie_chart(data_dir, args.epoch, other_share=args.other_share)
+        elif plot == "production":
+            plot_validator_block_production(
+                data_dir,
+                args.epoch,
+                slot_range,
+            )
+        elif plot == "votes":
+            plot_validators_voting(
+                data_dir,
+                args.epoch,
+                slot_range,
+                args.validators,
+                votes=results.get("votes"),
+            )
+        elif plot == "outliers":
+            plot_voting_outlier_behavior(
+                data_dir,
+                args.epoch,
+                slot_range,
+                sensibility=args.sensibility,
+                votes=results.get("votes"),
+                max_validators=args.max_validators,
+                window=args.window,
+                workers=args.workers,
+                cluster_mode=args.cluster_mode,
+            )
+        else:
+            raise Exception("Invalid operation")
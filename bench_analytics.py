@@ -0,0 +1,116 @@
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from analytics import (
+    get_block_production,
+    get_number_of_transactions,
+    get_rent_collected,
+    get_vote_behavior,
+)
+from bpc import get_distance_matrix, get_neighbor_graph
+from generate import generate_epoch
+from utils.synthetic import SyntheticCluster
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_analytics(
+    data_dir: Path,
+    epoch: int,
+    slot_range,
+    workers=1,
+    max_validators=100,
+    window=None,
+    sensibility=2,
+):
+    # every computation behind the plots, timed on its own and without the
+    # metrics cache, nothing is plotted
+    timings = {}
+    votes, timings["votes"] = timed(
+        get_vote_behavior, data_dir, epoch, slot_range, workers, cache=False
+    )
+    _, timings["rent"] = timed(
+        get_rent_collected, data_dir, epoch, slot_range, workers, cache=False
+    )
+    _, timings["transactions"] = timed(
+        get_number_of_transactions, data_dir, epoch, slot_range, workers, cache=False
+    )
+    _, timings["production"] = timed(get_block_production, data_dir, epoch, slot_range)
+
+    series = [votes.series(row) for row in range(min(len(votes), max_validators))]
+    _, timings["distance_matrix"] = timed(
+        get_distance_matrix, series, window=window, workers=workers
+    )
+    _, timings["neighbor_graph"] = timed(
+        get_neighbor_graph, series, sensibility, window=window, workers=workers
+    )
+    return timings
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument("--data-dir", type=str)
+    CLI.add_argument("--epoch", type=int, default=1)
+    CLI.add_argument(
+        "--slot-range",
+        nargs=2,
+        type=int,
+    )
+    CLI.add_argument("--workers", type=int, default=1)
+    CLI.add_argument("--max-validators", type=int, default=100)
+    CLI.add_argument("--window", type=int)
+    CLI.add_argument("--sensibility", type=float, default=2)
+    CLI.add_argument("--repeat", type=int, default=1)
+    CLI.add_argument("--output", type=str)
+    # used to generate an epoch when no data dir is given
+    CLI.add_argument("--slots", type=int, default=10000)
+    CLI.add_argument("--validators", type=int, default=100)
+    CLI.add_argument("--transactions", type=int, default=200)
+    CLI.add_argument("--seed", type=int, default=0)
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.data_dir is None:
+            data_dir = Path(tmp_dir)
+            cluster = SyntheticCluster(
+                seed=args.seed,
+                validators=args.validators,
+                transactions=args.transactions,
+            )
+            generate_epoch(
+                data_dir, args.epoch, cluster, args.slots, workers=args.workers
+            )
+            first_slot = args.epoch * cluster.slots_per_epoch
+            slot_range = list(range(first_slot, first_slot + args.slots))
+        else:
+            data_dir = Path(args.data_dir)
+            slot_range = list(range(*args.slot_range))
+
+        # the best of several runs is the least noisy
+        timings = {}
+        for _ in range(args.repeat):
+            run_timings = bench_analytics(
+                data_dir,
+                args.epoch,
+                slot_range,
+                workers=args.workers,
+                max_validators=args.max_validators,
+                window=args.window,
+                sensibility=args.sensibility,
+            )
+            for name, seconds in run_timings.items():
+                timings[name] = min(seconds, timings.get(name, seconds))
+
+    for name, seconds in timings.items():
+        print(f"{name:<16} {seconds:9.3f}s")
+    if args.output:
+        Path(args.output).write_text(json.dumps(timings, indent=2))
@@ -0,0 +1,208 @@
+import argparse
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+from multiprocessing import Process
+from pathlib import Path
+
+from solana.rpc.api import Client
+
+from dump import dump_blocks
+from parse import load_block
+from reader import BlockReader
+from stand_in import StandIn, make_server
+from utils.constants import *
+from utils.metrics import DumpMetrics
+from utils.objects import project_fields
+from utils.synthetic import SyntheticCluster
+
+# projections of the analytics, read from raw and modeled dumps to check both
+# give the same fields
+PARITY_PROJECTIONS = [
+    {"rewards"},
+    {"transactions.err", "transactions.fee"},
+    {"transactions.err", "transactions.transaction_instructions"},
+    {"transactions.signatures", "transactions.transaction_accounts"},
+    None,
+]
+
+
+def record_block(cluster: SyntheticCluster, record_dir: Path, slot: int):
+    if not cluster.is_skipped(slot):
+        (record_dir / f"{slot}.json").write_text(json.dumps(cluster.get_block(slot)))
+
+
+def record_blocks(cluster: SyntheticCluster, slots, record_dir: Path, workers=1):
+    # generating blocks is slower than dumping them, so the stand-in replays
+    # blocks generated beforehand
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(partial(record_block, cluster, record_dir), slots))
+
+
+def start_stand_in_process(stand_in: StandIn):
+    # the stand-in runs in its own process so it does not compete with the
+    # dumper for the GIL
+    server = make_server(stand_in)
+    process = Process(target=server.serve_forever, daemon=True)
+    process.start()
+    host, port = server.server_address[:2]
+    server.socket.close()
+    return process, f"http://{host}:{port}"
+
+
+def bench_dump_blocks(rpc_url: str, slots, workers=1, batch_size=1, retries=RETRIES):
+    metrics = DumpMetrics()
+    with tempfile.TemporaryDirectory() as dump_dir:
+        dump_blocks(
+            Client(rpc_url, timeout=60),
+            slots,
+            Path(dump_dir),
+            workers=workers,
+            batch_size=batch_size,
+            retries=retries,
+            metrics=metrics,
+        )
+    return metrics.summary()
+
+
+def projected_json(block, fields):
+    eager, transactions_fields = project_fields(fields, "transactions")
+    accounts_eager, _ = project_fields(transactions_fields, "transaction_accounts")
+    instructions_eager, _ = project_fields(
+        transactions_fields, "transaction_instructions"
+    )
+    transactions = []
+    for tr in block.transactions if eager else []:
+        tr_json = {
+            "signatures": tr.signatures,
+            "block": tr.block,
+            "err": tr.err,
+            "fee": tr.fee,
+            "rewards": tr.rewards,
+        }
+        if accounts_eager:
+            tr_json["transaction_accounts"] = [
+                tr_acc.to_json() for tr_acc in tr.transaction_accounts
+            ]
+        if instructions_eager:
+            tr_json["transaction_instructions"] = [
+                tr_inst.to_json() for tr_inst in tr.transaction_instructions
+            ]
+        transactions.append(tr_json)
+    return json.loads(
+        json.dumps(
+            {
+                "slot": block.slot,
+                "commitment": block.commitment,
+                "blockhash": block.blockhash,
+                "previous_blockhash": block.previous_blockhash,
+                "parent_slot": block.parent_slot,
+                "block_time": block.block_time,
+                "block_height": block.block_height,
+                "rewards": block.rewards,
+                "transactions": transactions,
+            }
+        )
+    )
+
+
+def check_raw_parity(rpc_url: str, slots, workers=1):
+    # the slots dumped raw and modeled read the same under every projection
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        modeled_dir, raw_dir = Path(tmp_dir) / "modeled", Path(tmp_dir) / "raw"
+        for dump_dir, raw in ((modeled_dir, False), (raw_dir, True)):
+            dump_dir.mkdir()
+            dump_blocks(Client(rpc_url, timeout=60), slots, dump_dir, workers, raw=raw)
+
+        mismatches = []
+        for block_file in sorted(modeled_dir.glob("*.json")):
+            modeled_bytes = block_file.read_bytes()
+            raw_bytes = (raw_dir / block_file.name).read_bytes()
+            for fields in PARITY_PROJECTIONS:
+                modeled = BlockReader.decode(modeled_bytes, fields)
+                raw = load_block(raw_bytes, fields)
+                if projected_json(modeled, fields) != projected_json(raw, fields):
+                    mismatches.append((int(block_file.stem), fields))
+    return mismatches
+
+
+def format_summary(workers, batch_size, summary):
+    stages = " ".join(
+        f"{name}={stage['seconds']:.2f}s"
+        for name, stage in sorted(summary["stages"].items())
+    )
+    return (
+        f"workers={workers:<3} batch={batch_size:<4} "
+        f"{summary['elapsed']:7.2f}s {summary['blocks_per_second']:8.1f} blocks/s "
+        f"{summary['bytes_per_second'] / 2**20:7.2f} MiB/s  {stages}"
+    )
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument("--slots", type=int, default=2000)
+    CLI.add_argument("--workers", nargs="+", type=int, default=[1, 4, 16])
+    CLI.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 10])
+    CLI.add_argument("--retries", type=int, default=RETRIES)
+    CLI.add_argument("--latency", type=float, default=0.05)
+    CLI.add_argument("--error-rate", type=float, default=0)
+    CLI.add_argument("--skip-rate", type=float, default=0.05)
+    CLI.add_argument("--transactions", type=int, default=200)
+    CLI.add_argument("--seed", type=int, default=0)
+    CLI.add_argument("--record-dir", type=str)
+    CLI.add_argument("--rpc-url", type=str)
+    CLI.add_argument("--output", type=str)
+    CLI.add_argument(
+        "--check-raw",
+        action="store_true",
+    )
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    slots = list(range(1, args.slots + 1))
+    process = None
+    rpc_url = args.rpc_url
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if rpc_url is None:
+            cluster = SyntheticCluster(
+                seed=args.seed,
+                transactions=args.transactions,
+                skip_rate=args.skip_rate,
+            )
+            # recorded blocks are replayed as they are, missing ones generated
+            if args.record_dir:
+                record_dir = Path(args.record_dir)
+            else:
+                record_dir = Path(tmp_dir)
+                record_blocks(cluster, slots, record_dir, workers=args.workers[-1])
+            stand_in = StandIn(
+                cluster,
+                slot_time=0,
+                latency=args.latency,
+                error_rate=args.error_rate,
+                record_dir=record_dir,
+            )
+            process, rpc_url = start_stand_in_process(stand_in)
+
+        if args.check_raw:
+            mismatches = check_raw_parity(rpc_url, slots, args.workers[-1])
+            for slot, fields in mismatches:
+                print(f"raw and modeled {slot} differ under {fields}")
+            print(f"raw parity: {len(mismatches)} mismatches")
+
+        results = []
+        for workers, batch_size in product(args.workers, args.batch_sizes):
+            summary = bench_dump_blocks(
+                rpc_url, slots, workers, batch_size, retries=args.retries
+            )
+            print(format_summary(workers, batch_size, summary))
+            results.append({"workers": workers, "batch_size": batch_size, **summary})
+
+        if process is not None:
+            process.terminate()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
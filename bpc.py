@@ -1,21 +1,186 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Optional
+
 import numpy as np
 from fastdtw import fastdtw
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.sparse import csr_matrix
 from sklearn.cluster import DBSCAN
 from tqdm import tqdm
 
 from utils.constants import *
 
-def get_distance_matrix(votes):
+# series every worker computes its rows of the distance matrix against
+_votes = None
+_window = None
+
+
+def banded_dtw(v1, v2, window):
+    # dtw restricted to the Sakoe-Chiba band |i - j| <= window, widened to the
+    # difference in length so the end of both series is always reachable
+    n, m = len(v1), len(v2)
+    window = max(window, abs(n - m))
+    v1 = np.asarray(v1, dtype=np.float64)
+    v2 = np.asarray(v2, dtype=np.float64)
+
+    # previous[j + 1] is the cost of the best path to (i - 1, j)
+    previous = np.full(m + 1, np.inf)
+    current = np.full(m + 1, np.inf)
+    previous[0] = 0
+    for i in range(n):
+        lo, hi = max(0, i - window), min(m, i + window + 1)
+        cost = np.abs(v1[i] - v2[lo:hi])
+        above = np.minimum(previous[lo:hi], previous[lo + 1 : hi + 1])
+        # the path can also come from the left, which unrolls into a running
+        # minimum over the band instead of a python loop
+        cumulative = np.cumsum(cost)
+        current[lo + 1 : hi + 1] = cumulative + np.minimum.accumulate(
+            above - (cumulative - cost)
+        )
+        current[lo] = np.inf
+        if hi < m:
+            current[hi + 1] = np.inf
+        previous, current = current, previous
+
+    return previous[m]
+
+
+def get_distance(v1, v2, window: Optional[int] = None):
+    if window is None:
+        distance, _ = fastdtw(v1, v2)
+    else:
+        distance = banded_dtw(v1, v2, window)
+    return distance / max(len(v1), len(v2))
+
+
+def _init_worker(votes, window):
+    global _votes, _window
+    _votes, _window = votes, window
+
+
+def _distance_row(i):
+    return [get_distance(_votes[i], v2, _window) for v2 in _votes[i + 1 :]]
+
+
+def _fill_upper_triangle(distances, row_distances):
+    for i, row in enumerate(tqdm(row_distances, total=len(distances))):
+        distances[i, i + 1 :] = row
+
+
+def get_distance_matrix(votes, window: Optional[int] = None, workers: int = 1):
+    # dtw is symmetric, so only the upper triangle is computed
     distances = np.zeros((len(votes), len(votes)))
-    for i, v1 in tqdm(enumerate(votes)):
-        for j, v2 in enumerate(votes):
-            distance, _ = fastdtw(v1, v2)
-            distances[i, j] = distance / max(len(v1), len(v2))
+    rows = range(len(votes))
+    if workers <= 1:
+        _init_worker(votes, window)
+        _fill_upper_triangle(distances, map(_distance_row, rows))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(votes, window)
+        ) as executor:
+            _fill_upper_triangle(distances, executor.map(_distance_row, rows))
+
+    return distances + distances.T
+
+
+def lb_kim(firsts, lasts, lengths, i, js):
+    # the first and last points of both series are always matched, in a single
+    # cell when both series are one point long
+    bound = np.abs(firsts[js] - firsts[i])
+    single = (lengths[js] == 1) & (lengths[i] == 1)
+    return bound + np.where(single, 0, np.abs(lasts[js] - lasts[i]))
+
+
+def lb_keogh(x, y, window: Optional[int] = None):
+    # every point of x is matched to some point of y within the band, so it
+    # costs at least its distance to the envelope of y around it
+    n, m = len(x), len(y)
+    window = max(n, m) if window is None else max(window, abs(n - m))
+    padded = np.pad(y, (window, window + max(0, n - m)), mode="edge")
+    size = 2 * window + 1
+    lower = minimum_filter1d(padded, size)[window : window + n]
+    upper = maximum_filter1d(padded, size)[window : window + n]
+    return np.sum(np.maximum(x - upper, 0) + np.maximum(lower - x, 0))
+
+
+def _neighbor_distance(pair, eps):
+    i, j = pair
+    v1, v2 = _votes[i], _votes[j]
+    length = max(len(v1), len(v2))
+    lb = max(lb_keogh(v1, v2, _window), lb_keogh(v2, v1, _window))
+    if lb / length > eps:
+        return np.inf
+    return get_distance(v1, v2, _window)
+
+
+def get_candidate_pairs(votes, eps):
+    # cheap lower bounds on dtw rule out most of the pairs before any dtw runs,
+    # only pairs whose bounds are within eps are returned
+    firsts = np.array([v[0] for v in votes], dtype=np.float64)
+    lasts = np.array([v[-1] for v in votes], dtype=np.float64)
+    lengths = np.array([len(v) for v in votes])
+
+    # the last points alone already bound the distance, so with the series
+    # sorted by them each one is only compared to its close neighbors
+    order = np.argsort(lasts, kind="stable")
+    sorted_lasts = lasts[order]
+    ends = np.searchsorted(sorted_lasts, sorted_lasts + eps * lengths.max(), "right")
+
+    pairs = []
+    for k, i in enumerate(order):
+        js = order[k + 1 : ends[k]]
+        max_lengths = np.maximum(lengths[js], lengths[i])
+        js = js[lb_kim(firsts, lasts, lengths, i, js) / max_lengths <= eps]
+        pairs.extend((min(i, j), max(i, j)) for j in js)
+
+    return pairs
+
+
+def get_neighbor_graph(votes, eps, window: Optional[int] = None, workers: int = 1):
+    # sparse precomputed distances for dbscan, pairs missing from the graph
+    # are further than eps, every point is its own neighbor
+    pairs = get_candidate_pairs(votes, eps)
+    if workers <= 1:
+        _init_worker(votes, window)
+        distances = [_neighbor_distance(pair, eps) for pair in tqdm(pairs)]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(votes, window)
+        ) as executor:
+            distances = list(
+                tqdm(
+                    executor.map(
+                        _neighbor_distance,
+                        pairs,
+                        repeat(eps),
+                        chunksize=max(1, len(pairs) // (16 * workers)),
+                    ),
+                    total=len(pairs),
+                )
+            )
+
+    diagonal = list(range(len(votes)))
+    rows, cols, data = diagonal, list(diagonal), [0.0] * len(votes)
+    for (i, j), distance in zip(pairs, distances):
+        if distance <= eps:
+            rows += [i, j]
+            cols += [j, i]
+            data += [distance, distance]
 
-    return distances
+    return csr_matrix((data, (rows, cols)), shape=(len(votes), len(votes)))
 
 
-def dbscan_cluster_vote_behavior(votes, sensibility=2):
-    M = get_distance_matrix(votes)
+def dbscan_cluster_vote_behavior(
+    votes,
+    sensibility=2,
+    window: Optional[int] = None,
+    workers: int = 1,
+    pruned: bool = False,
+):
+    if pruned:
+        M = get_neighbor_graph(votes, sensibility, window=window, workers=workers)
+    else:
+        M = get_distance_matrix(votes, window=window, workers=workers)
     model = DBSCAN(eps=sensibility, metric="precomputed")
     return model.fit_predict(M)
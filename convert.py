@@ -0,0 +1,107 @@
+import argparse
+import shutil
+from functools import partial
+from pathlib import Path
+
+from tqdm import tqdm
+
+from parse import load_block
+from utils.columnar import (
+    ColumnarWriter,
+    get_columnar_dir,
+    get_columnar_journal_file,
+)
+from utils.constants import *
+from utils.journal import DumpJournal
+from utils.segment import (
+    SEGMENT_SLOTS,
+    Segment,
+    SegmentWriter,
+    get_segment_name,
+    get_segments_dir,
+)
+
+
+def get_block_files(data_dir: Path, epoch: int):
+    blocks_dir = data_dir / str(epoch) / "blocks"
+    return sorted(
+        blocks_dir.glob("*.json"), key=lambda block_file: int(block_file.stem)
+    )
+
+
+def convert_to_columnar(data_dir: Path, epoch: int):
+    columnar_dir = get_columnar_dir(data_dir, epoch)
+    if columnar_dir.exists():
+        shutil.rmtree(columnar_dir)
+
+    with DumpJournal(get_columnar_journal_file(data_dir, epoch)) as journal:
+        writer = ColumnarWriter(
+            columnar_dir, on_flush=partial(journal.record_many, status=DONE)
+        )
+        for block_file in tqdm(get_block_files(data_dir, epoch)):
+            writer.add_block(load_block(block_file.read_bytes()))
+        writer.close()
+
+
+def convert_to_segments(
+    data_dir: Path, epoch: int, segment_slots: int = SEGMENT_SLOTS, delete=False
+):
+    segments_dir = get_segments_dir(data_dir, epoch)
+    segments_dir.mkdir(parents=True, exist_ok=True)
+
+    block_files = get_block_files(data_dir, epoch)
+    segment_block_files = {}
+    for block_file in block_files:
+        segment_name = get_segment_name(int(block_file.stem), segment_slots)
+        segment_block_files.setdefault(segment_name, []).append(block_file)
+
+    for segment_name, files in tqdm(segment_block_files.items()):
+        segment_file = segments_dir / segment_name
+        slots = {int(block_file.stem) for block_file in files}
+        writer = SegmentWriter(segment_file)
+        if segment_file.exists():
+            # blocks packed before, whose files may be deleted since, are kept
+            # unless they are packed again
+            segment = Segment(segment_file)
+            for slot in segment.slots.tolist():
+                if slot not in slots:
+                    writer.add(slot, segment.read(slot))
+        # block files are packed as they are, without being parsed
+        for block_file in files:
+            writer.add(int(block_file.stem), block_file.read_bytes())
+        writer.close()
+
+    if delete:
+        for block_file in block_files:
+            block_file.unlink()
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument(
+        "format",
+        choices=["columnar", "segments"],
+    )
+    CLI.add_argument("--data-dir", type=str, required=True)
+    CLI.add_argument("--epoch", type=int, required=True)
+    CLI.add_argument(
+        "--segment-slots",
+        type=int,
+        default=SEGMENT_SLOTS,
+    )
+    CLI.add_argument(
+        "--delete",
+        action="store_true",
+    )
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    if args.format == "columnar":
+        convert_to_columnar(Path(args.data_dir), args.epoch)
+    elif args.format == "segments":
+        convert_to_segments(
+            Path(args.data_dir), args.epoch, args.segment_slots, args.delete
+        )
+    else:
+        raise Exception("Invalid format")
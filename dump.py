@@ -2,15 +2,56 @@ import argparse
 import json
 import time
 from argparse import ArgumentError
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional
 
 from solana.exceptions import SolanaRpcException
 from solana.rpc.api import Client
 from tqdm import tqdm
 
-from models import AccountTransaction, Block, InstructionTransaction, Transaction
+from parse import parse_block, parse_transaction, wrap_raw_block
+from utils.columnar import (
+    ColumnarWriter,
+    get_columnar_dir,
+    get_columnar_journal_file,
+)
 from utils.constants import *
+from utils.file import (
+    get_blocks_dir,
+    get_dump_journal_file,
+    get_follow_state_file,
+    get_vote_table_file,
+    write_bytes_atomic,
+    write_json_atomic,
+)
+from utils.journal import DumpJournal
+from utils.metrics import (
+    BLOCKS,
+    BYTES_WRITTEN,
+    FAILED_BLOCKS,
+    FETCH,
+    JSON_FORMAT,
+    METRICS_INTERVAL,
+    PARSE,
+    PROMETHEUS_FORMAT,
+    RESPONSE_BYTES,
+    RETRIED_BATCHES,
+    RPC_ERRORS,
+    SERIALIZE,
+    SKIPPED_BLOCKS,
+    WRITE,
+    DumpMetrics,
+    MetricsExporter,
+    count,
+    stage,
+)
+from utils.manifest import get_present_slots
+from utils.rpc import BatchClient, BatchNotSupportedError
+from utils.schedule import LeaderSchedule
+from votes import VoteTableWriter, extract_vote_instructions
 
 
 def get_epoch_bounds(api_client: Client, epoch: int):
@@ -21,7 +62,7 @@ def get_epoch_bounds(api_client: Client, epoch: int):
     if not (first_normal_epoch <= epoch <= current_epoch):
         raise ArgumentError("Epoch does not exist yet or it was not of stable length")
 
-    first_normal_slot = epoch_schedule[FIRST_NORMAL_EPOCH]
+    first_normal_slot = epoch_schedule[FIRST_NORMAL_SLOT]
     slots_per_epoch = epoch_schedule[SLOTS_PER_EPOCH]
 
     low_bound = first_normal_slot + slots_per_epoch * (epoch - first_normal_epoch)
@@ -30,127 +71,236 @@ def get_epoch_bounds(api_client: Client, epoch: int):
     return low_bound, up_bound
 
 
-def parse_block(block_json, slot, commitment):
-    return (
-        Block(
-            slot=slot,
-            commitment=commitment,
-            blockhash=block_json[BLOCKHASH],
-            previous_blockhash=block_json[PREVIOUS_BLOCKHASH],
-            parent_slot=block_json[PARENT_SLOT],
-            block_time=block_json[BLOCK_TIME],
-            block_height=block_json[BLOCK_HEIGHT],
-            rewards=block_json[REWARDS],
-            transactions=[],
-            signatures=[],
-        ),
-        block_json[TRANSACTIONS],
-    )
-
-
-def parse_transaction(transaction_json, slot):
-    transaction = Transaction(
-        block=slot,
-        signatures=transaction_json[TRANSACTION][SIGNATURES],
-        err=transaction_json[META][ERR],
-        fee=transaction_json[META][FEE],
-        rewards=transaction_json[META][REWARDS],
-        transaction_instructions=transaction_json[TRANSACTION][MESSAGE][INSTRUCTIONS],
-    )
-    transaction.transaction_accounts = parse_transaction_accounts(
-        transaction_json, transaction._id
-    )
-    transaction.transaction_instructions = parse_transaction_instructions(
-        transaction_json, transaction._id
-    )
-    return transaction
-
-
-def parse_transaction_accounts(transaction_json, transaction_id):
-    account_keys = transaction_json[TRANSACTION][MESSAGE][ACCOUNT_KEYS]
-    pre_balances = transaction_json[META][PRE_BALANCES]
-    posts_balances = transaction_json[META][POST_BALANCES]
-    signatures = transaction_json[TRANSACTION][SIGNATURES] + [None] * (
-        len(account_keys)
-    )
-    return [
-        AccountTransaction(
-            transaction_id=transaction_id,
-            pubkey=key_info[PUBKEY],
-            pre_balance=pre_balance,
-            post_balance=post_balance,
-            read_only=not key_info[WRITABLE],
-            signed=key_info[SIGNER],
-            signature=signature,
-        )
-        for key_info, pre_balance, post_balance, signature in zip(
-            account_keys, pre_balances, posts_balances, signatures
-        )
-    ]
-
-
-def parse_transaction_instructions(transaction_json, transaction_id):
-
-    account_keys = transaction_json[TRANSACTION][MESSAGE][ACCOUNT_KEYS]
-
-    return [
-        InstructionTransaction(
-            data=instruction_json[DATA]
-            if DATA in instruction_json
-            else instruction_json[PARSED],
-            program_account=account_keys[instruction_json[PROGRAM_ID_INDEX]]
-            if PROGRAM_ID_INDEX in instruction_json
-            else instruction_json[PROGRAM_ID],
-            accounts=instruction_json[ACCOUNTS]
-            if ACCOUNTS in instruction_json
-            else None,
-            program_name=instruction_json[PROGRAM]
-            if PROGRAM in instruction_json
-            else None,
-        )
-        for idx, instruction_json in enumerate(
-            transaction_json[TRANSACTION][MESSAGE][INSTRUCTIONS]
-        )
-    ]
+def store_block(
+    block_json,
+    slot: int,
+    dump_dir: Path,
+    writer: Optional[ColumnarWriter] = None,
+    vote_table: Optional[VoteTableWriter] = None,
+    commitment: str = FINALIZED,
+    metrics: Optional[DumpMetrics] = None,
+):
+    with stage(metrics, PARSE):
+        block, block_transactions = parse_block(block_json, slot, commitment)
 
+        for transaction_json in block_transactions:
+            transaction = parse_transaction(transaction_json, slot)
+            block.transactions.append(transaction)
 
-def dump_blocks(
-    api_client: Client,
-    blocks_slots: List[int],
+    if vote_table is not None:
+        vote_table.add(slot, extract_vote_instructions(block))
+
+    if writer is not None:
+        writer.add_block(block)
+        return
+
+    with stage(metrics, SERIALIZE):
+        block_bytes = json.dumps(block.to_json()).encode()
+    with stage(metrics, WRITE):
+        write_bytes_atomic(dump_dir / f"{slot}.json", block_bytes)
+    count(metrics, BYTES_WRITTEN, len(block_bytes))
+
+
+def store_raw_block(
+    block_bytes: bytes,
+    slot: int,
     dump_dir: Path,
+    commitment: str = FINALIZED,
+    metrics: Optional[DumpMetrics] = None,
+):
+    # the getBlock result is written as it came, modeled when it is read
+    with stage(metrics, SERIALIZE):
+        block_bytes = wrap_raw_block(block_bytes, slot, commitment)
+    with stage(metrics, WRITE):
+        write_bytes_atomic(dump_dir / f"{slot}.json", block_bytes)
+    count(metrics, BYTES_WRITTEN, len(block_bytes))
+
+
+def get_blocks_one_by_one(
+    batch_client: BatchClient,
+    slots: List[int],
+    raw=False,
+    commitment: Optional[str] = None,
+):
+    get_block = batch_client.get_block_raw if raw else batch_client.get_block
+    return [get_block(slot, "jsonParsed", commitment) for slot in slots]
+
+
+def get_blocks_in_batch(
+    batch_client: BatchClient,
+    slots: List[int],
+    raw=False,
+    commitment: Optional[str] = None,
 ):
-    for i, slot in enumerate(blocks_slots):
+    # endpoints without batch support are asked for the blocks one by one
+    if batch_client.supports_batches:
+        get_block_batch = (
+            batch_client.get_block_batch_raw if raw else batch_client.get_block_batch
+        )
         try:
-            print(f"Processing block {i+1}/{len(blocks_slots)}: {slot}")
+            return get_block_batch(slots, "jsonParsed", commitment)
+        except BatchNotSupportedError as e:
+            tqdm.write(f"{e}, fetching blocks one by one")
+            batch_client.supports_batches = False
+    return get_blocks_one_by_one(batch_client, slots, raw, commitment)
 
-            block_json = api_client.get_block(slot, encoding="jsonParsed")
-            if RESULT not in block_json:
-                print("Skipped!")
-                continue
 
-            block_json = block_json[RESULT]
-            block, block_transactions = parse_block(block_json, slot, FINALIZED)
+def get_response_counter(metrics: Optional[DumpMetrics]):
+    if metrics is not None:
+        return partial(metrics.count, RESPONSE_BYTES)
 
-            for transaction_json in tqdm(block_transactions):
-                transaction = parse_transaction(transaction_json, slot)
-                block.transactions.append(transaction)
 
-            with open(dump_dir / f"{slot}.json", "w") as fp:
-                json.dump(block.to_json(), fp)
+def dump_block_batch(
+    fetch_blocks: Callable[[List[int]], List[dict]],
+    slots: List[int],
+    dump_dir: Path,
+    journal: Optional[DumpJournal] = None,
+    retries: int = RETRIES,
+    writer: Optional[ColumnarWriter] = None,
+    vote_table: Optional[VoteTableWriter] = None,
+    metrics: Optional[DumpMetrics] = None,
+    raw: bool = False,
+):
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            count(metrics, RETRIED_BATCHES)
+            time.sleep(min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX))
+        try:
+            with stage(metrics, FETCH):
+                blocks_json = fetch_blocks(slots)
         except SolanaRpcException:
-            time.sleep(10)
-        except Exception as e:
-            raise e
+            count(metrics, RPC_ERRORS)
+            continue
+
+        failed_slots = []
+        for block_json, slot in zip(blocks_json, slots):
+            if block_json.get(RESULT) is not None:
+                if raw:
+                    store_raw_block(block_json[RESULT], slot, dump_dir, metrics=metrics)
+                else:
+                    store_block(
+                        block_json[RESULT],
+                        slot,
+                        dump_dir,
+                        writer,
+                        vote_table,
+                        metrics=metrics,
+                    )
+                count(metrics, BLOCKS)
+                if writer is not None:
+                    # recorded as done once the writer flushes it to disk
+                    continue
+                status = DONE
+            elif (
+                RESULT in block_json
+                or block_json.get(ERROR, {}).get(CODE) in SKIPPED_SLOT_ERRORS
+            ):
+                count(metrics, SKIPPED_BLOCKS)
+                status = SKIPPED
+            else:
+                failed_slots.append(slot)
+                continue
+            if journal is not None:
+                journal.record(slot, status)
 
+        slots = failed_slots
+        if not slots:
+            return
 
-def dump_epoch_leader_schedule(api_client: Client, first_slot: int, dump_dir: Path):
-    leader_schedule = api_client.get_leader_schedule(first_slot)[RESULT]
+    count(metrics, FAILED_BLOCKS, len(slots))
+    for slot in slots:
+        tqdm.write(f"Failed {slot} after {retries} retries!")
+        if journal is not None:
+            journal.record(slot, FAILED)
+
+
+def dump_blocks(
+    api_client: Client,
+    blocks_slots: List[int],
+    dump_dir: Path,
+    workers: int = 1,
+    batch_size: int = 1,
+    journal: Optional[DumpJournal] = None,
+    retries: int = RETRIES,
+    writer: Optional[ColumnarWriter] = None,
+    vote_table: Optional[VoteTableWriter] = None,
+    metrics: Optional[DumpMetrics] = None,
+    raw: bool = False,
+):
+    batch_client = BatchClient.from_client(
+        api_client, on_response=get_response_counter(metrics)
+    )
+    if batch_size > 1:
+        fetch_blocks = partial(get_blocks_in_batch, batch_client, raw=raw)
+    else:
+        fetch_blocks = partial(get_blocks_one_by_one, batch_client, raw=raw)
+
+    # each worker fetches, parses and writes its own slots, so with several
+    # workers the RPC round trips overlap with parsing and disk writes
+    max_in_flight = 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(
+        total=len(blocks_slots)
+    ) as progress:
+        in_flight = {}
+        for i in range(0, len(blocks_slots), batch_size):
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    progress.update(in_flight.pop(future))
+            slots = blocks_slots[i : i + batch_size]
+            future = executor.submit(
+                dump_block_batch,
+                fetch_blocks,
+                slots,
+                dump_dir,
+                journal,
+                retries,
+                writer,
+                vote_table,
+                metrics,
+                raw,
+            )
+            in_flight[future] = len(slots)
+
+        for future, n_slots in in_flight.items():
+            future.result()
+            progress.update(n_slots)
+
+
+def store_leader_schedule(leader_schedule, first_slot: int, dump_dir: Path):
     leader_schedule = {
         pubkey: [first_slot + slot_offset for slot_offset in slots]
         for pubkey, slots in leader_schedule.items()
     }
     with open(dump_dir / f"leader_schedule.json", "w") as fp:
         json.dump(leader_schedule, fp)
+    LeaderSchedule.from_dict(leader_schedule).save(dump_dir / "leader_schedule.npz")
+
+
+def dump_epoch_leader_schedule(api_client: Client, first_slot: int, dump_dir: Path):
+    leader_schedule = api_client.get_leader_schedule(first_slot)[RESULT]
+    store_leader_schedule(leader_schedule, first_slot, dump_dir)
+
+
+def get_produced_slots(api_client: Client, low_bound: int, up_bound: int):
+    produced_slots = []
+    for start_slot in range(low_bound, up_bound, MAX_BLOCKS_RANGE):
+        end_slot = min(start_slot + MAX_BLOCKS_RANGE, up_bound) - 1
+        produced_slots += api_client.get_blocks(start_slot, end_slot)[RESULT]
+    return produced_slots
+
+
+def dump_epoch_skipped_slots(
+    api_client: Client, low_bound: int, up_bound: int, dump_dir: Path
+):
+    # slots after the current one are not skipped, just not produced yet
+    up_bound = min(up_bound, api_client.get_slot()[RESULT] + 1)
+    produced_slots = get_produced_slots(api_client, low_bound, up_bound)
+    skipped_slots = sorted(set(range(low_bound, up_bound)) - set(produced_slots))
+    with open(dump_dir / "skipped_slots.json", "w") as fp:
+        json.dump(skipped_slots, fp)
+    return produced_slots
 
 
 def dump_epoch(
@@ -160,10 +310,26 @@ def dump_epoch(
     from_slot=0,
     to_slot=-1,
     dump_schedule=False,
+    workers=1,
+    batch_size=1,
+    all_slots=False,
+    retries=RETRIES,
+    columnar=False,
+    metrics: Optional[DumpMetrics] = None,
+    raw=False,
+    journal_file: Optional[Path] = None,
+    vote_table_file: Optional[Path] = None,
 ):
-    epoch_bounds = get_epoch_bounds(http_client, epoch)
+    epoch_bounds = get_epoch_bounds(api_client, epoch)
     low_bound, up_bound = epoch_bounds
 
+    if journal_file is None and columnar:
+        journal_file = get_columnar_journal_file(dump_dir, epoch)
+    elif journal_file is None:
+        journal_file = get_dump_journal_file(dump_dir, epoch)
+    if vote_table_file is None:
+        vote_table_file = get_vote_table_file(dump_dir, epoch)
+    columnar_dir = get_columnar_dir(dump_dir, epoch)
     dump_dir = dump_dir / str(epoch)
     dump_dir.mkdir(parents=True, exist_ok=True)
 
@@ -172,15 +338,213 @@ def dump_epoch(
 
     if to_slot == -1:
         to_slot = up_bound - low_bound
-    dump_blocks(
-        api_client,
-        list(range(low_bound, up_bound))[from_slot:to_slot],
-        blocks_dir,
-    )
+    blocks_slots = list(range(low_bound, up_bound))[from_slot:to_slot]
+    if not all_slots:
+        produced_slots = set(
+            dump_epoch_skipped_slots(api_client, low_bound, up_bound, dump_dir)
+        )
+        blocks_slots = [slot for slot in blocks_slots if slot in produced_slots]
+
+    # raw blocks are not modeled, so their votes are not extracted, the vote
+    # table stays without their slots and the analytics scan them instead
+    with DumpJournal(journal_file) as journal, (
+        nullcontext() if raw else VoteTableWriter(vote_table_file)
+    ) as vote_table:
+        if columnar:
+            blocks_slots = journal.pending(blocks_slots)
+            writer = ColumnarWriter(
+                columnar_dir, on_flush=partial(journal.record_many, status=DONE)
+            )
+        else:
+            blocks_slots = journal.pending(
+                blocks_slots, get_present_slots(dump_dir.parent, epoch, blocks_slots)
+            )
+            writer = None
+
+        dump_blocks(
+            api_client,
+            blocks_slots,
+            blocks_dir,
+            workers=workers,
+            batch_size=batch_size,
+            journal=journal,
+            retries=retries,
+            writer=writer,
+            vote_table=vote_table,
+            metrics=metrics,
+            raw=raw,
+        )
+        if writer is not None:
+            writer.close()
     if dump_schedule:
         dump_epoch_leader_schedule(api_client, low_bound, dump_dir)
 
 
+def get_slot_epoch(epoch_schedule, slot: int):
+    first_normal_slot = epoch_schedule[FIRST_NORMAL_SLOT]
+    return (
+        epoch_schedule[FIRST_NORMAL_EPOCH]
+        + (slot - first_normal_slot) // epoch_schedule[SLOTS_PER_EPOCH]
+    )
+
+
+def fetch_blocks_at(
+    batch_client: BatchClient,
+    slots: List[int],
+    commitment: str,
+    batch_size: int,
+    metrics: Optional[DumpMetrics] = None,
+):
+    for i in range(0, len(slots), batch_size):
+        batch = slots[i : i + batch_size]
+        try:
+            with stage(metrics, FETCH):
+                if batch_size > 1:
+                    blocks_json = get_blocks_in_batch(
+                        batch_client, batch, commitment=commitment
+                    )
+                else:
+                    blocks_json = get_blocks_one_by_one(
+                        batch_client, batch, commitment=commitment
+                    )
+        except SolanaRpcException as e:
+            count(metrics, RPC_ERRORS)
+            tqdm.write(f"Failed to fetch {batch[0]}-{batch[-1]}: {e}")
+            continue
+        yield from zip(batch, blocks_json)
+
+
+def follow_tip(
+    api_client: Client,
+    data_dir: Path,
+    from_slot: Optional[int] = None,
+    poll_interval: float = FOLLOW_POLL_INTERVAL,
+    batch_size: int = 1,
+    polls: Optional[int] = None,
+    retries: int = FOLLOW_RETRIES,
+    metrics: Optional[DumpMetrics] = None,
+):
+    batch_client = BatchClient.from_client(
+        api_client, on_response=get_response_counter(metrics)
+    )
+    epoch_schedule = api_client.get_epoch_schedule()[RESULT]
+
+    # blocks stored at confirmed commitment that can still change, and slots
+    # whose block was not available yet, survive restarts in the state file
+    state_file = get_follow_state_file(data_dir)
+    state = json.loads(state_file.read_text()) if state_file.exists() else {}
+    next_slot = state.get(NEXT_SLOT, from_slot)
+    confirmed = set(state.get(CONFIRMED, []))
+    missing = set(state.get(MISSING, []))
+    attempts = {int(slot): n for slot, n in state.get(ATTEMPTS, {}).items()}
+
+    vote_tables = {}
+    journals = {}
+
+    def get_slot_blocks_dir(slot):
+        blocks_dir = get_blocks_dir(data_dir, get_slot_epoch(epoch_schedule, slot))
+        blocks_dir.mkdir(parents=True, exist_ok=True)
+        return blocks_dir
+
+    def get_slot_vote_table(slot):
+        epoch = get_slot_epoch(epoch_schedule, slot)
+        if epoch not in vote_tables:
+            vote_tables[epoch] = VoteTableWriter(get_vote_table_file(data_dir, epoch))
+        return vote_tables[epoch]
+
+    def get_slot_journal(slot):
+        epoch = get_slot_epoch(epoch_schedule, slot)
+        if epoch not in journals:
+            journals[epoch] = DumpJournal(get_dump_journal_file(data_dir, epoch))
+        return journals[epoch]
+
+    poll = 0
+    try:
+        while polls is None or poll < polls:
+            confirmed_tip = api_client.get_slot(CONFIRMED)[RESULT]
+            finalized_tip = api_client.get_slot(FINALIZED)[RESULT]
+            if next_slot is None:
+                next_slot = confirmed_tip
+            missing |= set(range(next_slot, confirmed_tip + 1))
+            next_slot = max(next_slot, confirmed_tip + 1)
+
+            # new blocks are stored as soon as they are confirmed
+            to_confirm = sorted(slot for slot in missing if slot > finalized_tip)
+            for slot, block_json in fetch_blocks_at(
+                batch_client, to_confirm, CONFIRMED, batch_size, metrics
+            ):
+                if block_json.get(RESULT) is not None:
+                    store_block(
+                        block_json[RESULT],
+                        slot,
+                        get_slot_blocks_dir(slot),
+                        commitment=CONFIRMED,
+                        metrics=metrics,
+                    )
+                    count(metrics, BLOCKS)
+                    confirmed.add(slot)
+                    missing.discard(slot)
+                elif block_json.get(ERROR, {}).get(CODE) in SKIPPED_SLOT_ERRORS:
+                    count(metrics, SKIPPED_BLOCKS)
+                    missing.discard(slot)
+
+            # and fetched again once finalized, which overwrites them, or
+            # deletes them if their fork was abandoned
+            to_finalize = sorted(
+                slot for slot in confirmed | missing if slot <= finalized_tip
+            )
+            for slot, block_json in fetch_blocks_at(
+                batch_client, to_finalize, FINALIZED, batch_size, metrics
+            ):
+                if block_json.get(RESULT) is not None:
+                    store_block(
+                        block_json[RESULT],
+                        slot,
+                        get_slot_blocks_dir(slot),
+                        vote_table=get_slot_vote_table(slot),
+                        commitment=FINALIZED,
+                        metrics=metrics,
+                    )
+                    count(metrics, BLOCKS)
+                elif block_json.get(ERROR, {}).get(CODE) in SKIPPED_SLOT_ERRORS:
+                    count(metrics, SKIPPED_BLOCKS)
+                    if slot in confirmed:
+                        tqdm.write(f"Block {slot} was orphaned")
+                        (get_slot_blocks_dir(slot) / f"{slot}.json").unlink(
+                            missing_ok=True
+                        )
+                else:
+                    # given up after a few polls, the slot is left to a dump of
+                    # its epoch, which fetches failed slots again
+                    attempts[slot] = attempts.get(slot, 0) + 1
+                    if attempts[slot] <= retries:
+                        continue
+                    count(metrics, FAILED_BLOCKS)
+                    tqdm.write(f"Failed {slot} after {retries} retries!")
+                    get_slot_journal(slot).record(slot, FAILED)
+                attempts.pop(slot, None)
+                confirmed.discard(slot)
+                missing.discard(slot)
+
+            write_json_atomic(
+                state_file,
+                {
+                    NEXT_SLOT: next_slot,
+                    CONFIRMED: sorted(confirmed),
+                    MISSING: sorted(missing),
+                    ATTEMPTS: attempts,
+                },
+            )
+            poll += 1
+            if polls is None or poll < polls:
+                time.sleep(poll_interval)
+    finally:
+        for vote_table in vote_tables.values():
+            vote_table.close()
+        for journal in journals.values():
+            journal.close()
+
+
 if __name__ == "__main__":
     CLI = argparse.ArgumentParser()
     CLI.add_argument(
@@ -188,7 +552,7 @@ if __name__ == "__main__":
         choices=[MAINNET, DEVNET, TESTNET],
     )
     CLI.add_argument("--data-dir", type=str, required=True)
-    CLI.add_argument("--epoch", type=int, required=True)
+    CLI.add_argument("--epoch", type=int)
     CLI.add_argument(
         "--slot-range",
         nargs=2,
@@ -199,19 +563,112 @@ if __name__ == "__main__":
         "--schedule",
         action="store_true",
     )
+    CLI.add_argument(
+        "--format",
+        choices=["json", "columnar", "raw"],
+        default="json",
+    )
+    CLI.add_argument(
+        "--all-slots",
+        action="store_true",
+    )
+    CLI.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+    )
+    CLI.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+    )
+    CLI.add_argument(
+        "--retries",
+        type=int,
+        default=RETRIES,
+    )
+    CLI.add_argument(
+        "--follow",
+        action="store_true",
+    )
+    CLI.add_argument(
+        "--from-slot",
+        type=int,
+    )
+    CLI.add_argument(
+        "--poll-interval",
+        type=float,
+        default=FOLLOW_POLL_INTERVAL,
+    )
+    CLI.add_argument(
+        "--rpc-url",
+        type=str,
+    )
+    CLI.add_argument(
+        "--metrics-file",
+        type=str,
+    )
+    CLI.add_argument(
+        "--metrics-format",
+        choices=[JSON_FORMAT, PROMETHEUS_FORMAT],
+        default=JSON_FORMAT,
+    )
+    CLI.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=METRICS_INTERVAL,
+    )
 
     # parse the command line
     args = CLI.parse_args()
 
     print(args.schedule)
 
-    http_client = Client(f"https://api.{args.cluster}.solana.com")
-
-    dump_epoch(
-        http_client,
-        args.epoch,
-        Path(args.data_dir),
-        args.slot_range[0],
-        args.slot_range[1],
-        args.schedule,
-    )
+    http_client = Client(args.rpc_url or f"https://api.{args.cluster}.solana.com")
+
+    if not args.follow and args.epoch is None:
+        CLI.error("--epoch is required unless following the tip")
+    if args.follow and args.format != "json":
+        CLI.error("--follow only dumps in the json format")
+
+    metrics = None
+    exporter = None
+    if args.metrics_file:
+        metrics = DumpMetrics()
+        exporter = MetricsExporter(
+            metrics,
+            Path(args.metrics_file),
+            format=args.metrics_format,
+            interval=args.metrics_interval,
+        ).start()
+
+    try:
+        if args.follow:
+            follow_tip(
+                http_client,
+                Path(args.data_dir),
+                from_slot=args.from_slot,
+                poll_interval=args.poll_interval,
+                batch_size=args.batch_size,
+                retries=args.retries,
+                metrics=metrics,
+            )
+        else:
+            dump_epoch(
+                http_client,
+                args.epoch,
+                Path(args.data_dir),
+                args.slot_range[0],
+                args.slot_range[1],
+                args.schedule,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                all_slots=args.all_slots,
+                retries=args.retries,
+                columnar=args.format == "columnar",
+                metrics=metrics,
+                raw=args.format == "raw",
+            )
+    finally:
+        if exporter is not None:
+            exporter.stop()
@@ -0,0 +1,97 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import List
+
+from tqdm import tqdm
+
+from dump import store_block, store_leader_schedule
+from utils.constants import *
+from utils.file import get_blocks_dir, get_skipped_slots_file
+from utils.manifest import build_manifest
+from utils.synthetic import SyntheticCluster
+from votes import index_votes
+
+
+def generate_blocks(cluster: SyntheticCluster, blocks_dir: Path, slots: List[int]):
+    for slot in slots:
+        if not cluster.is_skipped(slot):
+            store_block(cluster.get_block(slot), slot, blocks_dir)
+    return len(slots)
+
+
+def generate_epoch(
+    data_dir: Path,
+    epoch: int,
+    cluster: SyntheticCluster,
+    n_slots: int = -1,
+    workers: int = 1,
+    vote_table: bool = False,
+):
+    # an epoch directory like dump_epoch leaves it, with the blocks of the
+    # first n_slots slots of the epoch
+    first_slot = epoch * cluster.slots_per_epoch
+    if n_slots == -1:
+        n_slots = cluster.slots_per_epoch
+    slots = list(range(first_slot, first_slot + n_slots))
+
+    dump_dir = data_dir / str(epoch)
+    blocks_dir = get_blocks_dir(data_dir, epoch)
+    blocks_dir.mkdir(parents=True, exist_ok=True)
+
+    store_leader_schedule(cluster.get_leader_schedule(epoch), first_slot, dump_dir)
+    skipped_slots = [slot for slot in slots if cluster.is_skipped(slot)]
+    get_skipped_slots_file(data_dir, epoch).write_text(json.dumps(skipped_slots))
+
+    chunk_size = 1000
+    chunks = [slots[i : i + chunk_size] for i in range(0, len(slots), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor, tqdm(
+        total=len(slots)
+    ) as progress:
+        for n_generated in executor.map(
+            partial(generate_blocks, cluster, blocks_dir), chunks
+        ):
+            progress.update(n_generated)
+
+    build_manifest(data_dir, epoch)
+    if vote_table:
+        index_votes(data_dir, epoch, slots)
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument("--data-dir", type=str, required=True)
+    CLI.add_argument("--epoch", type=int, required=True)
+    CLI.add_argument("--slots", type=int, default=-1)
+    CLI.add_argument("--slots-per-epoch", type=int, default=432000)
+    CLI.add_argument("--validators", type=int, default=100)
+    CLI.add_argument("--transactions", type=int, default=200)
+    CLI.add_argument("--vote-share", type=float, default=0.7)
+    CLI.add_argument("--skip-rate", type=float, default=0.05)
+    CLI.add_argument("--seed", type=int, default=0)
+    CLI.add_argument("--workers", type=int, default=1)
+    CLI.add_argument(
+        "--vote-table",
+        action="store_true",
+    )
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    generate_epoch(
+        Path(args.data_dir),
+        args.epoch,
+        SyntheticCluster(
+            seed=args.seed,
+            validators=args.validators,
+            transactions=args.transactions,
+            vote_share=args.vote_share,
+            skip_rate=args.skip_rate,
+            slots_per_epoch=args.slots_per_epoch,
+        ),
+        n_slots=args.slots,
+        workers=args.workers,
+        vote_table=args.vote_table,
+    )
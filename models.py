@@ -1,9 +1,23 @@
-from typing import Dict, Union, List
+from typing import Dict, Optional, Set, Union, List
 
-from utils import FINALIZED, CONFIRMED, PROCESSED, Model
+from utils import FINALIZED, CONFIRMED, PROCESSED, Model, intern_key, project_fields
 
 
 class Block(Model):
+    __slots__ = (
+        "slot",
+        "commitment",
+        "blockhash",
+        "previous_blockhash",
+        "parent_slot",
+        "rewards",
+        "block_time",
+        "block_height",
+        "signatures",
+        "_transactions",
+        "_raw_transactions",
+    )
+
     def __init__(
         self,
         slot: int,
@@ -32,9 +46,25 @@ class Block(Model):
     def _id(self):
         return self.slot
 
+    @property
+    def transactions(self):
+        # transactions left out of the projection are only built when used
+        if self._raw_transactions is not None:
+            self._transactions = [
+                Transaction.from_dict(tr_json) for tr_json in self._raw_transactions
+            ]
+            self._raw_transactions = None
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions):
+        self._transactions = transactions
+        self._raw_transactions = None
+
     @classmethod
-    def from_dict(cls, dict: dict):
-        return cls(
+    def from_dict(cls, dict: dict, fields: Optional[Set[str]] = None):
+        eager, transactions_fields = project_fields(fields, "transactions")
+        block = cls(
             slot=dict["slot"],
             commitment=dict["commitment"],
             blockhash=dict["blockhash"],
@@ -44,10 +74,16 @@ class Block(Model):
             block_time=dict["block_time"],
             block_height=dict["block_height"],
             transactions=[
-                Transaction.from_json(tr_json) for tr_json in dict["transactions"]
-            ],
+                Transaction.from_dict(tr_json, fields=transactions_fields)
+                for tr_json in dict["transactions"]
+            ]
+            if eager
+            else [],
             signatures=dict["signatures"],
         )
+        if not eager:
+            block._raw_transactions = dict["transactions"]
+        return block
 
     def to_json(self):
         return {
@@ -59,9 +95,10 @@ class Block(Model):
             "rewards": self.rewards,
             "block_time": self.block_time,
             "block_height": self.block_height,
-            "transactions": self.transactions,
+            "transactions": self._raw_transactions
+            if self._raw_transactions is not None
+            else [tr.to_json() for tr in self.transactions],
             "signatures": self.signatures,
-            "transactions": [tr.to_json() for tr in self.transactions],
         }
 
     @property
@@ -70,6 +107,18 @@ class Block(Model):
 
 
 class Transaction(Model):
+    __slots__ = (
+        "signatures",
+        "block",
+        "err",
+        "fee",
+        "rewards",
+        "_transaction_accounts",
+        "_raw_transaction_accounts",
+        "_transaction_instructions",
+        "_raw_transaction_instructions",
+    )
+
     def __init__(
         self,
         signatures,
@@ -92,9 +141,41 @@ class Transaction(Model):
     def _id(self):
         return self.signatures[0]
 
+    @property
+    def transaction_accounts(self):
+        if self._raw_transaction_accounts is not None:
+            self._transaction_accounts = [
+                AccountTransaction.from_dict(tr_acc)
+                for tr_acc in self._raw_transaction_accounts
+            ]
+            self._raw_transaction_accounts = None
+        return self._transaction_accounts
+
+    @transaction_accounts.setter
+    def transaction_accounts(self, transaction_accounts):
+        self._transaction_accounts = transaction_accounts
+        self._raw_transaction_accounts = None
+
+    @property
+    def transaction_instructions(self):
+        if self._raw_transaction_instructions is not None:
+            self._transaction_instructions = [
+                InstructionTransaction.from_dict(tr_inst)
+                for tr_inst in self._raw_transaction_instructions
+            ]
+            self._raw_transaction_instructions = None
+        return self._transaction_instructions
+
+    @transaction_instructions.setter
+    def transaction_instructions(self, transaction_instructions):
+        self._transaction_instructions = transaction_instructions
+        self._raw_transaction_instructions = None
+
     @classmethod
-    def from_dict(cls, dict: dict):
-        return cls(
+    def from_dict(cls, dict: dict, fields: Optional[Set[str]] = None):
+        accounts_eager, _ = project_fields(fields, "transaction_accounts")
+        instructions_eager, _ = project_fields(fields, "transaction_instructions")
+        transaction = cls(
             signatures=dict["signatures"],
             block=dict["block"],
             err=dict["err"],
@@ -103,12 +184,21 @@ class Transaction(Model):
             transaction_accounts=[
                 AccountTransaction.from_json(tr_acc)
                 for tr_acc in dict["transaction_accounts"]
-            ],
+            ]
+            if accounts_eager
+            else [],
             transaction_instructions=[
                 InstructionTransaction.from_json(tr_inst)
                 for tr_inst in dict["transaction_instructions"]
-            ],
+            ]
+            if instructions_eager
+            else [],
         )
+        if not accounts_eager:
+            transaction._raw_transaction_accounts = dict["transaction_accounts"]
+        if not instructions_eager:
+            transaction._raw_transaction_instructions = dict["transaction_instructions"]
+        return transaction
 
     def to_json(self):
         return {
@@ -117,16 +207,26 @@ class Transaction(Model):
             "err": self.err,
             "fee": self.fee,
             "rewards": self.rewards,
-            "transaction_accounts": [
-                tr_acc.to_json() for tr_acc in self.transaction_accounts
-            ],
-            "transaction_instructions": [
-                tr_inst.to_json() for tr_inst in self.transaction_instructions
-            ],
+            "transaction_accounts": self._raw_transaction_accounts
+            if self._raw_transaction_accounts is not None
+            else [tr_acc.to_json() for tr_acc in self.transaction_accounts],
+            "transaction_instructions": self._raw_transaction_instructions
+            if self._raw_transaction_instructions is not None
+            else [tr_inst.to_json() for tr_inst in self.transaction_instructions],
         }
 
 
 class AccountTransaction(Model):
+    __slots__ = (
+        "pubkey",
+        "transaction_id",
+        "pre_balance",
+        "post_balance",
+        "read_only",
+        "signed",
+        "signature",
+    )
+
     def __init__(
         self,
         transaction_id=None,
@@ -153,7 +253,7 @@ class AccountTransaction(Model):
     def from_dict(cls, dict: dict):
         return cls(
             transaction_id=dict["transaction_id"],
-            pubkey=dict["pubkey"],
+            pubkey=intern_key(dict["pubkey"]),
             pre_balance=dict["pre_balance"],
             post_balance=dict["post_balance"],
             read_only=dict["read_only"],
@@ -174,6 +274,8 @@ class AccountTransaction(Model):
 
 
 class InstructionTransaction(Model):
+    __slots__ = ("accounts", "data", "program_account", "program_name")
+
     def __init__(
         self,
         accounts=None,
@@ -195,7 +297,7 @@ class InstructionTransaction(Model):
         return cls(
             accounts=dict["accounts"],
             data=dict["data"],
-            program_account=dict["program_account"],
+            program_account=intern_key(dict["program_account"]),
             program_name=dict["program_name"],
         )
 
@@ -209,18 +311,32 @@ class InstructionTransaction(Model):
 
 
 class BlockStakeCommitment(Model):
+    __slots__ = ("stake_votes", "total_epoch_active_stake")
+
     def __init__(self, stake_votes, total_epoch_active_stake):
         self.stake_votes = stake_votes
         self.total_epoch_active_stake = total_epoch_active_stake
 
 
 class VoteInstruction(Model):
-    def __init__(self, vote_authority=None, vote_account=None, hash=None, timestamp=None, slots=None):
-        self.vote_authority=vote_authority
+    __slots__ = ("vote_authority", "vote_account", "hash", "timestamp", "slots", "slot")
+
+    def __init__(
+        self,
+        vote_authority=None,
+        vote_account=None,
+        hash=None,
+        timestamp=None,
+        slots=None,
+        slot=None,
+    ):
+        self.vote_authority = vote_authority
         self.vote_account = vote_account
         self.hash = hash
         self.timestamp = timestamp
         self.slots = slots
+        # slot of the block the vote was included in
+        self.slot = slot
 
     @property
     def _id(self):
@@ -234,6 +350,7 @@ class VoteInstruction(Model):
             hash=dict["hash"],
             timestamp=dict["timestamp"],
             slots=dict["slots"],
+            slot=dict.get("slot"),
         )
 
     def to_json(self):
@@ -243,4 +360,5 @@ class VoteInstruction(Model):
             "hash": self.hash,
             "timestamp": self.timestamp,
             "slots": self.slots,
-        }
\ No newline at end of file
+            "slot": self.slot,
+        }
@@ -0,0 +1,382 @@
+import argparse
+import json
+import os
+import time
+from multiprocessing import Process
+from pathlib import Path
+from typing import List
+
+from solana.rpc.api import Client
+
+from dump import dump_epoch, get_epoch_bounds
+from utils.columnar import get_columnar_journal_file
+from utils.constants import *
+from utils.file import (
+    get_dump_journal_file,
+    get_shard_plan_file,
+    get_shards_dir,
+    get_skipped_slots_file,
+    get_vote_table_file,
+    write_bytes_atomic,
+    write_json_atomic,
+)
+from utils.journal import read_journal
+from utils.lease import (
+    LEASE_TTL,
+    LeaseHeartbeat,
+    acquire_lease,
+    get_worker_id,
+    is_lease_expired,
+)
+
+# Epochs are split into shards of consecutive slots that independent workers,
+# on this machine or others sharing the data dir, claim through lease files.
+# A shard is done once its done marker exists. Every shard has its own journal
+# and vote table, merged into those of the epoch once all shards are done.
+
+SHARD_SIZE = 10000
+POLL_INTERVAL = 10
+# a worker leaves a shard still failing after this many dumps to the others
+SHARD_ATTEMPTS = 3
+
+LEASED = "leased"
+EXPIRED = "expired"
+PENDING = "pending"
+
+
+def plan_shards(api_client: Client, data_dir: Path, epoch: int, shard_size: int):
+    # the first worker writes the plan, the others follow it even if they were
+    # given another shard size
+    plan_file = get_shard_plan_file(data_dir, epoch)
+    if not plan_file.exists():
+        low_bound, up_bound = get_epoch_bounds(api_client, epoch)
+        n_slots = up_bound - low_bound
+        shards = [
+            [from_slot, min(from_slot + shard_size, n_slots)]
+            for from_slot in range(0, n_slots, shard_size)
+        ]
+        get_shards_dir(data_dir, epoch).mkdir(parents=True, exist_ok=True)
+        # linking fails if the plan exists, so workers planning at the same
+        # time end up with one plan
+        tmp_file = plan_file.with_name(f".{plan_file.name}.{get_worker_id()}.tmp")
+        write_bytes_atomic(tmp_file, json.dumps(shards).encode())
+        try:
+            os.link(tmp_file, plan_file)
+        except FileExistsError:
+            pass
+        tmp_file.unlink()
+    return load_shards(data_dir, epoch)
+
+
+def load_shards(data_dir: Path, epoch: int):
+    plan_file = get_shard_plan_file(data_dir, epoch)
+    if not plan_file.exists():
+        return []
+    return [tuple(shard) for shard in json.loads(plan_file.read_text())]
+
+
+def get_lease_file(data_dir: Path, epoch: int, shard):
+    return get_shards_dir(data_dir, epoch) / f"{shard[0]}-{shard[1]}.lease"
+
+
+def get_done_file(data_dir: Path, epoch: int, shard):
+    return get_shards_dir(data_dir, epoch) / f"{shard[0]}-{shard[1]}.done"
+
+
+def get_shard_journal_file(data_dir: Path, epoch: int, shard):
+    return get_shards_dir(data_dir, epoch) / f"{shard[0]}-{shard[1]}.journal.jsonl"
+
+
+def get_shard_vote_table_file(data_dir: Path, epoch: int, shard):
+    return get_shards_dir(data_dir, epoch) / f"{shard[0]}-{shard[1]}.votes.jsonl"
+
+
+def get_failed_slots(data_dir: Path, epoch: int, shard):
+    statuses = read_journal(get_shard_journal_file(data_dir, epoch, shard))
+    return sorted(slot for slot, status in statuses.items() if status == FAILED)
+
+
+def get_shard_status(data_dir: Path, epoch: int, shard, lease_ttl=LEASE_TTL):
+    if get_done_file(data_dir, epoch, shard).exists():
+        return DONE
+    lease_file = get_lease_file(data_dir, epoch, shard)
+    if is_lease_expired(lease_file, lease_ttl):
+        return EXPIRED
+    if lease_file.exists():
+        return LEASED
+    return PENDING
+
+
+def get_finish_lease_file(data_dir: Path, epoch: int):
+    return get_shards_dir(data_dir, epoch) / "finish.lease"
+
+
+def get_finished_file(data_dir: Path, epoch: int):
+    return get_shards_dir(data_dir, epoch) / "finished"
+
+
+def read_vote_table_lines(vote_table_file: Path):
+    lines = {}
+    if vote_table_file.exists():
+        for line in vote_table_file.read_text().splitlines():
+            try:
+                lines[json.loads(line)[SLOT]] = line
+            except ValueError:
+                # last line may be cut short if the dumper crashed
+                continue
+    return lines
+
+
+def finish_epoch(data_dir: Path, epoch: int, shards, columnar=False):
+    # the epoch journal and vote table are rewritten whole, from what they held
+    # before with the shards on top, so finishing again gives the same files
+    if columnar:
+        journal_file = get_columnar_journal_file(data_dir, epoch)
+    else:
+        journal_file = get_dump_journal_file(data_dir, epoch)
+    vote_table_file = get_vote_table_file(data_dir, epoch)
+
+    statuses = read_journal(journal_file)
+    vote_table_lines = read_vote_table_lines(vote_table_file)
+    for shard in shards:
+        statuses.update(read_journal(get_shard_journal_file(data_dir, epoch, shard)))
+        vote_table_lines.update(
+            read_vote_table_lines(get_shard_vote_table_file(data_dir, epoch, shard))
+        )
+
+    write_bytes_atomic(
+        journal_file,
+        "".join(
+            json.dumps({SLOT: slot, STATUS: status}) + "\n"
+            for slot, status in sorted(statuses.items())
+        ).encode(),
+    )
+    write_bytes_atomic(
+        vote_table_file,
+        "".join(line + "\n" for _, line in sorted(vote_table_lines.items())).encode(),
+    )
+    # shards are dumped without listing the produced slots of the whole epoch
+    # first, the skipped ones are in the journals instead
+    skipped_slots = sorted(
+        slot for slot, status in statuses.items() if status == SKIPPED
+    )
+    write_json_atomic(get_skipped_slots_file(data_dir, epoch), skipped_slots)
+
+
+def try_finish_epoch(
+    data_dir: Path, epoch: int, shards, worker_id: str, lease_ttl=LEASE_TTL, **kwargs
+):
+    # one worker finishes the epoch under a lease, reclaimed if it dies
+    lease_file = get_finish_lease_file(data_dir, epoch)
+    if not acquire_lease(lease_file, worker_id, lease_ttl):
+        return False
+    with LeaseHeartbeat(lease_file, worker_id, lease_ttl):
+        # another worker may have finished it before the lease was taken
+        if not get_finished_file(data_dir, epoch).exists():
+            finish_epoch(data_dir, epoch, shards, **kwargs)
+            get_finished_file(data_dir, epoch).touch()
+    return True
+
+
+def dump_shard(
+    api_client: Client,
+    data_dir: Path,
+    epoch: int,
+    shard,
+    worker_id: str,
+    lease_ttl=LEASE_TTL,
+    dump_schedule=False,
+    **dump_kwargs,
+):
+    with LeaseHeartbeat(get_lease_file(data_dir, epoch, shard), worker_id, lease_ttl):
+        dump_epoch(
+            api_client,
+            epoch,
+            data_dir,
+            shard[0],
+            shard[1],
+            dump_schedule and shard[0] == 0,
+            all_slots=True,
+            journal_file=get_shard_journal_file(data_dir, epoch, shard),
+            vote_table_file=get_shard_vote_table_file(data_dir, epoch, shard),
+            **dump_kwargs,
+        )
+        # a shard with failed slots is left pending to be dumped again
+        if get_failed_slots(data_dir, epoch, shard):
+            return False
+        get_done_file(data_dir, epoch, shard).touch()
+        return True
+
+
+def run_worker(
+    api_client: Client,
+    data_dir: Path,
+    epochs: List[int],
+    shard_size=SHARD_SIZE,
+    lease_ttl=LEASE_TTL,
+    poll_interval=POLL_INTERVAL,
+    **dump_kwargs,
+):
+    worker_id = get_worker_id()
+    attempts = {}
+    plans = {
+        epoch: plan_shards(api_client, data_dir, epoch, shard_size) for epoch in epochs
+    }
+
+    while True:
+        remaining = 0
+        claimed = False
+        for epoch, shards in plans.items():
+            for shard in shards:
+                if get_done_file(data_dir, epoch, shard).exists():
+                    continue
+                if attempts.get((epoch, shard), 0) >= SHARD_ATTEMPTS:
+                    continue
+                remaining += 1
+                lease_file = get_lease_file(data_dir, epoch, shard)
+                if not acquire_lease(lease_file, worker_id, lease_ttl):
+                    continue
+                claimed = True
+                if not dump_shard(
+                    api_client,
+                    data_dir,
+                    epoch,
+                    shard,
+                    worker_id,
+                    lease_ttl,
+                    **dump_kwargs,
+                ):
+                    attempts[(epoch, shard)] = attempts.get((epoch, shard), 0) + 1
+
+            # checked on every pass, the worker finishing the last shard may die
+            # before finishing the epoch
+            if get_finished_file(data_dir, epoch).exists() or not all(
+                get_done_file(data_dir, epoch, shard).exists() for shard in shards
+            ):
+                continue
+            if not try_finish_epoch(
+                data_dir,
+                epoch,
+                shards,
+                worker_id,
+                lease_ttl,
+                columnar=dump_kwargs.get("columnar", False),
+            ):
+                # another worker is finishing it
+                remaining += 1
+
+        if not remaining:
+            return
+        # the shards left are leased by other workers, which may die
+        if not claimed:
+            time.sleep(poll_interval)
+
+
+def get_progress(data_dir: Path, epochs: List[int], lease_ttl=LEASE_TTL):
+    progress = {}
+    for epoch in epochs:
+        statuses = {DONE: 0, LEASED: 0, EXPIRED: 0, PENDING: 0}
+        done_slots = total_slots = 0
+        failed_slots = []
+        for shard in load_shards(data_dir, epoch):
+            status = get_shard_status(data_dir, epoch, shard, lease_ttl)
+            statuses[status] += 1
+            total_slots += shard[1] - shard[0]
+            if status == DONE:
+                done_slots += shard[1] - shard[0]
+            else:
+                failed_slots += get_failed_slots(data_dir, epoch, shard)
+        progress[epoch] = {
+            **statuses,
+            SLOTS: [done_slots, total_slots],
+            FAILED: failed_slots,
+        }
+    return progress
+
+
+def format_progress(progress):
+    lines = []
+    for epoch, statuses in progress.items():
+        done_slots, total_slots = statuses[SLOTS]
+        shards = sum(statuses[status] for status in (DONE, LEASED, EXPIRED, PENDING))
+        percent = 100 * done_slots / total_slots if total_slots else 0
+        lines.append(
+            f"epoch {epoch}: {statuses[DONE]}/{shards} shards done, "
+            f"{statuses[LEASED]} leased, {statuses[EXPIRED]} expired, "
+            f"{statuses[PENDING]} pending, {percent:.1f}% of slots"
+        )
+        failed_slots = statuses[FAILED]
+        if failed_slots:
+            listed = " ".join(str(slot) for slot in failed_slots[:10])
+            more = " ..." if len(failed_slots) > 10 else ""
+            lines.append(f"  {len(failed_slots)} failed slots: {listed}{more}")
+    return "\n".join(lines)
+
+
+def run_client_worker(rpc_url: str, *args, **kwargs):
+    run_worker(Client(rpc_url, timeout=60), *args, **kwargs)
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument(
+        "cluster",
+        choices=[MAINNET, DEVNET, TESTNET],
+    )
+    CLI.add_argument("--data-dir", type=str, required=True)
+    CLI.add_argument("--epochs", nargs="+", type=int, required=True)
+    CLI.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    CLI.add_argument("--processes", type=int, default=1)
+    CLI.add_argument("--lease-ttl", type=float, default=LEASE_TTL)
+    CLI.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    CLI.add_argument(
+        "--status",
+        action="store_true",
+    )
+    CLI.add_argument(
+        "--schedule",
+        action="store_true",
+    )
+    CLI.add_argument(
+        "--format",
+        choices=["json", "columnar"],
+        default="json",
+    )
+    CLI.add_argument("--workers", type=int, default=1)
+    CLI.add_argument("--batch-size", type=int, default=1)
+    CLI.add_argument("--retries", type=int, default=RETRIES)
+    CLI.add_argument("--rpc-url", type=str)
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    data_dir = Path(args.data_dir)
+    if args.status:
+        print(format_progress(get_progress(data_dir, args.epochs, args.lease_ttl)))
+    else:
+        rpc_url = args.rpc_url or f"https://api.{args.cluster}.solana.com"
+        processes = [
+            Process(
+                target=run_client_worker,
+                args=(rpc_url, data_dir, args.epochs),
+                kwargs=dict(
+                    shard_size=args.shard_size,
+                    lease_ttl=args.lease_ttl,
+                    poll_interval=args.poll_interval,
+                    dump_schedule=args.schedule,
+                    workers=args.workers,
+                    batch_size=args.batch_size,
+                    retries=args.retries,
+                    columnar=args.format == "columnar",
+                ),
+            )
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+
+        while any(process.is_alive() for process in processes):
+            time.sleep(args.poll_interval)
+            print(format_progress(get_progress(data_dir, args.epochs, args.lease_ttl)))
+        for process in processes:
+            process.join()
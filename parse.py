@@ -0,0 +1,136 @@
+from models import AccountTransaction, Block, InstructionTransaction, Transaction
+from utils.constants import *
+from utils.objects import intern_key, loads, project_fields
+from utils.schemas import HAS_MSGSPEC, decode_raw_block
+
+# Turning getBlock results into models, at dump time or, for blocks dumped raw,
+# at read time. Raw blocks are the getBlock result as the RPC sent it, in an
+# envelope giving the slot and commitment, which the result does not have.
+# A raw block read with a projection only models the projected fields, the
+# nested lists left out of it stay empty.
+
+RAW_BLOCK_PREFIX = b'{"format":"rpc",'
+
+
+def parse_block(block_json, slot, commitment):
+    return (
+        Block(
+            slot=slot,
+            commitment=commitment,
+            blockhash=block_json[BLOCKHASH],
+            previous_blockhash=block_json[PREVIOUS_BLOCKHASH],
+            parent_slot=block_json[PARENT_SLOT],
+            block_time=block_json[BLOCK_TIME],
+            block_height=block_json[BLOCK_HEIGHT],
+            rewards=block_json[REWARDS],
+            transactions=[],
+            signatures=[],
+        ),
+        block_json.get(TRANSACTIONS, []),
+    )
+
+
+def parse_transaction(transaction_json, slot, fields=None):
+    accounts_eager, _ = project_fields(fields, "transaction_accounts")
+    instructions_eager, _ = project_fields(fields, "transaction_instructions")
+    transaction = Transaction(
+        block=slot,
+        signatures=transaction_json[TRANSACTION][SIGNATURES],
+        err=transaction_json[META][ERR],
+        fee=transaction_json[META][FEE],
+        rewards=transaction_json[META][REWARDS],
+    )
+    if accounts_eager:
+        transaction.transaction_accounts = parse_transaction_accounts(
+            transaction_json, transaction._id
+        )
+    if instructions_eager:
+        transaction.transaction_instructions = parse_transaction_instructions(
+            transaction_json, transaction._id
+        )
+    return transaction
+
+
+def parse_transaction_accounts(transaction_json, transaction_id):
+    account_keys = transaction_json[TRANSACTION][MESSAGE][ACCOUNT_KEYS]
+    pre_balances = transaction_json[META][PRE_BALANCES]
+    posts_balances = transaction_json[META][POST_BALANCES]
+    # only the first accounts are signers, each with its signature
+    signatures = transaction_json[TRANSACTION][SIGNATURES]
+    return [
+        AccountTransaction(
+            transaction_id=transaction_id,
+            pubkey=intern_key(key_info[PUBKEY]),
+            pre_balance=pre_balance,
+            post_balance=post_balance,
+            read_only=not key_info[WRITABLE],
+            signed=key_info[SIGNER],
+            signature=signatures[i] if i < len(signatures) else None,
+        )
+        for i, (key_info, pre_balance, post_balance) in enumerate(
+            zip(account_keys, pre_balances, posts_balances)
+        )
+    ]
+
+
+def parse_transaction_instructions(transaction_json, transaction_id):
+
+    account_keys = transaction_json[TRANSACTION][MESSAGE][ACCOUNT_KEYS]
+
+    return [
+        InstructionTransaction(
+            data=instruction_json[DATA]
+            if DATA in instruction_json
+            else instruction_json[PARSED],
+            program_account=intern_key(
+                account_keys[instruction_json[PROGRAM_ID_INDEX]]
+                if PROGRAM_ID_INDEX in instruction_json
+                else instruction_json[PROGRAM_ID]
+            ),
+            accounts=instruction_json[ACCOUNTS]
+            if ACCOUNTS in instruction_json
+            else None,
+            program_name=instruction_json[PROGRAM]
+            if PROGRAM in instruction_json
+            else None,
+        )
+        for idx, instruction_json in enumerate(
+            transaction_json[TRANSACTION][MESSAGE][INSTRUCTIONS]
+        )
+    ]
+
+
+def wrap_raw_block(block_bytes: bytes, slot: int, commitment: str):
+    return b'%s"slot":%d,"commitment":"%s","block":%s}' % (
+        RAW_BLOCK_PREFIX,
+        slot,
+        commitment.encode(),
+        block_bytes,
+    )
+
+
+def is_raw_block(block_bytes: bytes):
+    return block_bytes.startswith(RAW_BLOCK_PREFIX)
+
+
+def model_raw_block(block_bytes: bytes, fields=None):
+    if HAS_MSGSPEC:
+        envelope = decode_raw_block(block_bytes, fields)
+    else:
+        envelope = loads(block_bytes)
+    slot = envelope[SLOT]
+    block, block_transactions = parse_block(envelope[BLOCK], slot, envelope[COMMITMENT])
+    eager, transactions_fields = project_fields(fields, "transactions")
+    if eager:
+        block.transactions = [
+            parse_transaction(transaction_json, slot, transactions_fields)
+            for transaction_json in block_transactions
+        ]
+    return block
+
+
+def load_block(block_bytes: bytes, fields=None):
+    # the same model whether the block was dumped raw or modeled
+    if is_raw_block(block_bytes):
+        return model_raw_block(block_bytes, fields)
+    return Block.from_json(block_bytes, fields=fields)
@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable, Optional, Set
+
+from parse import is_raw_block, load_block
+from utils.compact import COMPACT_FIELDS, CompactBlocks
+from utils.file import get_block_file, get_keys_file
+from utils.keys import KeyDictionary
+from utils.manifest import load_manifest
+from utils.schemas import HAS_MSGSPEC, decode_block
+from utils.segment import Segment, get_segments_dir
+
+
+class BlockReader:
+    def __init__(self, data_dir: Path, epoch: int):
+        self.data_dir = data_dir
+        self.epoch = epoch
+
+        # segments are sorted by their first slot and opened on first use
+        segments_dir = get_segments_dir(data_dir, epoch)
+        segment_files = (
+            list(segments_dir.glob("*.seg")) if segments_dir.exists() else []
+        )
+        self._segment_files = sorted(
+            segment_files,
+            key=lambda segment_file: int(segment_file.stem.split("-")[0]),
+        )
+        self._first_slots = [
+            int(segment_file.stem.split("-")[0]) for segment_file in self._segment_files
+        ]
+        self._segments = {}
+        self.manifest = load_manifest(data_dir, epoch)
+
+    def _segment(self, slot: int):
+        position = bisect_right(self._first_slots, slot) - 1
+        if position < 0:
+            return None
+        segment_file = self._segment_files[position]
+        if segment_file not in self._segments:
+            self._segments[segment_file] = Segment(segment_file)
+        segment = self._segments[segment_file]
+        return segment if slot in segment else None
+
+    def exists(self, slot: int):
+        return slot in self.manifest
+
+    def fingerprint(self, slot: int):
+        # changes whenever the block is rewritten
+        segment = self._segment(slot)
+        if segment is not None:
+            return segment.fingerprint(slot)
+        stat = get_block_file(self.data_dir, self.epoch, slot).stat()
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def read_bytes(self, slot: int):
+        segment = self._segment(slot)
+        if segment is not None:
+            return segment.read(slot)
+        return get_block_file(self.data_dir, self.epoch, slot).read_bytes()
+
+    @staticmethod
+    def decode(block_bytes: bytes, fields: Optional[Set[str]] = None):
+        if HAS_MSGSPEC and not is_raw_block(block_bytes):
+            return decode_block(block_bytes, fields)
+        return load_block(block_bytes, fields)
+
+    def read(self, slot: int, fields: Optional[Set[str]] = None):
+        return self.decode(self.read_bytes(slot), fields)
+
+    def read_compact(self, slots: Iterable[int], instructions=True, save_keys=False):
+        # ids of the keys saved in the dictionary of the epoch stay the same
+        # from one load to the next, new keys only get ids in memory unless
+        # saved, so reads leave the data dir as it is
+        fields = COMPACT_FIELDS
+        if not instructions:
+            fields = fields - {"transactions.transaction_instructions"}
+        keys_file = get_keys_file(self.data_dir, self.epoch)
+        keys = KeyDictionary.load(keys_file)
+        compact = CompactBlocks.from_blocks(
+            (self.read(slot, fields) for slot in sorted(slots) if self.exists(slot)),
+            keys,
+            instructions,
+        )
+        if save_keys:
+            compact.remap_keys(keys.save(keys_file))
+        return compact
@@ -0,0 +1,369 @@
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from tqdm import tqdm
+
+from models import VoteInstruction
+from reader import BlockReader
+from utils.cache import MetricsCache
+from utils.constants import *
+from utils.file import get_metrics_cache_file
+
+CHUNKS_PER_WORKER = 4
+# blocks per column chunk of the vote progress matrix
+VOTE_CHUNK_BLOCKS = 4096
+NO_VOTE = np.iinfo(np.int32).min
+
+
+class Aggregator:
+    # block fields the aggregator reads, everything else is loaded lazily
+    fields = None
+    # name its extracted values are cached under, not cached when None
+    cache_key = None
+
+    def extract(self, block):
+        raise NotImplementedError
+
+    def add(self, i, slot, value):
+        raise NotImplementedError
+
+    # folds in the aggregator of the chunk of slots right after this one
+    def merge(self, other):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class RentAggregator(Aggregator):
+    fields = {"rewards"}
+    cache_key = "rent"
+
+    def __init__(self):
+        self.rent = {}
+        self.given = {}
+
+    def extract(self, block):
+        return (
+            sum(
+                [
+                    -rw[LAMPORTS]
+                    for rw in block.rewards
+                    if rw[REWARD_TYPE] == RENT and rw[LAMPORTS] < 0
+                ]
+            ),
+            sum(
+                [
+                    rw[LAMPORTS]
+                    for rw in block.rewards
+                    if rw[REWARD_TYPE] == RENT and rw[LAMPORTS] > 0
+                ]
+            ),
+        )
+
+    def add(self, i, slot, value):
+        self.rent[slot], self.given[slot] = value or (0, 0)
+
+    def merge(self, other):
+        self.rent.update(other.rent)
+        self.given.update(other.given)
+
+    def result(self):
+        return self.rent, self.given
+
+
+class TransactionsAggregator(Aggregator):
+    fields = {"transactions.err"}
+    cache_key = "transactions"
+
+    def __init__(self):
+        self.total = {}
+        self.fail = {}
+
+    def extract(self, block):
+        return (
+            len(block.transactions),
+            len([tr for tr in block.transactions if tr.err is not None]),
+        )
+
+    def add(self, i, slot, value):
+        self.total[slot], self.fail[slot] = value or (0, 0)
+
+    def merge(self, other):
+        self.total.update(other.total)
+        self.fail.update(other.fail)
+
+    def result(self):
+        return self.total, self.fail
+
+
+class VoteProgress:
+    def __init__(self, validators, votes, base_slot, first_votes, starts):
+        # one row per validator, in the order they first voted, and one column
+        # per block with the last slot it voted for, relative to base_slot,
+        # or NO_VOTE before its first vote
+        self.validators = validators
+        self.votes = votes
+        self.base_slot = base_slot
+        # slot index (+1) of the first vote, and block it was included in
+        self.first_votes = first_votes
+        self.starts = starts
+        self._rows = {validator: row for row, validator in enumerate(validators)}
+
+    def __len__(self):
+        return len(self.validators)
+
+    def __contains__(self, validator):
+        return validator in self._rows
+
+    def index(self, validator):
+        return self._rows[validator]
+
+    def series(self, row):
+        return self.votes[row, self.starts[row] :] + np.int64(self.base_slot)
+
+
+def forward_fill(votes, carried):
+    # fills the blocks a validator did not vote in with its previous vote,
+    # starting with the votes carried over from the blocks before
+    first_column = votes[:, 0]
+    np.copyto(first_column, carried, where=first_column == NO_VOTE)
+    last_vote = np.where(votes != NO_VOTE, np.arange(votes.shape[1]), 0)
+    np.maximum.accumulate(last_vote, axis=1, out=last_vote)
+    votes[:] = np.take_along_axis(votes, last_vote, axis=1)
+
+
+class VoteAggregator(Aggregator):
+    fields = {"transactions.err", "transactions.transaction_instructions"}
+    cache_key = "votes"
+
+    def __init__(self):
+        self.validators = {}
+        self.first_votes = []
+        self.starts = []
+        self.n_blocks = 0
+        self.base_slot = None
+        # votes are written sparsely into fixed width column chunks, the
+        # carry forward only happens once in result
+        self.chunks = []
+        self._used = 0
+
+    def extract(self, block):
+        return [
+            (vote[VOTE_AUTHORITY], vote[VOTE][SLOTS][-1])
+            for vote in [
+                tr_inst.data[INFO]
+                for tr in block.transactions
+                for tr_inst in tr.transaction_instructions
+                if tr.err is None
+                and tr_inst.program_account == VOTE_PROGRAM_ACCOUNT
+                and tr_inst.data[TYPE] == VOTE
+            ]
+        ]
+
+    def _trimmed_chunks(self):
+        if not self.chunks:
+            return []
+        return self.chunks[:-1] + [self.chunks[-1][:, : self._used]]
+
+    def add(self, i, slot, value):
+        if value is None:
+            return
+
+        if not self.chunks or self._used == self.chunks[-1].shape[1]:
+            self.chunks.append(
+                np.full(
+                    (max(len(self.validators), 64), VOTE_CHUNK_BLOCKS),
+                    NO_VOTE,
+                    dtype=np.int32,
+                )
+            )
+            self._used = 0
+        chunk = self.chunks[-1]
+
+        for authority, vote_slot in value:
+            if self.base_slot is None:
+                self.base_slot = vote_slot
+            row = self.validators.get(authority)
+            if row is None:
+                row = self.validators[authority] = len(self.validators)
+                self.first_votes.append(i + 1)
+                self.starts.append(self.n_blocks)
+                if row == len(chunk):
+                    chunk = self.chunks[-1] = np.vstack(
+                        [chunk, np.full_like(chunk, NO_VOTE)]
+                    )
+            chunk[row, self._used] = vote_slot - self.base_slot
+
+        self._used += 1
+        self.n_blocks += 1
+
+    def merge(self, other):
+        if self.base_slot is None:
+            self.base_slot = other.base_slot
+
+        rows = []
+        for validator, other_row in other.validators.items():
+            row = self.validators.get(validator)
+            if row is None:
+                row = self.validators[validator] = len(self.validators)
+                self.first_votes.append(other.first_votes[other_row])
+                self.starts.append(self.n_blocks + other.starts[other_row])
+            rows.append(row)
+        rows = np.array(rows, dtype=np.int64)
+        rebase = 0 if other.base_slot is None else other.base_slot - self.base_slot
+
+        # other's rows are moved to this aggregator's validator order and its
+        # votes made relative to this base slot, holes are filled in result
+        chunks = self._trimmed_chunks()
+        for other_chunk in other._trimmed_chunks():
+            other_chunk = other_chunk[: len(rows)]
+            chunk = np.full(
+                (len(self.validators), other_chunk.shape[1]), NO_VOTE, dtype=np.int32
+            )
+            chunk[rows[: len(other_chunk)]] = np.where(
+                other_chunk == NO_VOTE,
+                NO_VOTE,
+                other_chunk + rebase,
+            )
+            chunks.append(chunk)
+
+        self.chunks = chunks
+        self._used = chunks[-1].shape[1] if chunks else 0
+        self.n_blocks += other.n_blocks
+
+    def result(self):
+        votes = np.full((len(self.validators), self.n_blocks), NO_VOTE, np.int32)
+        carried = np.full(len(self.validators), NO_VOTE, np.int32)
+        column = 0
+        for chunk in self._trimmed_chunks():
+            chunk_votes = votes[:, column : column + chunk.shape[1]]
+            chunk_votes[: len(chunk)] = chunk[: len(self.validators)]
+            forward_fill(chunk_votes, carried)
+            carried = chunk_votes[:, -1]
+            column += chunk.shape[1]
+
+        return VoteProgress(
+            list(self.validators),
+            votes,
+            self.base_slot or 0,
+            np.array(self.first_votes, dtype=np.int64),
+            np.array(self.starts, dtype=np.int64),
+        )
+
+
+def scan_vote_table(
+    vote_table: Dict[int, List[VoteInstruction]],
+    slot_range: List[int],
+    aggregator: VoteAggregator,
+):
+    # same votes VoteAggregator.extract would find in the blocks
+    for i, slot in enumerate(slot_range):
+        votes = vote_table.get(slot)
+        if votes is not None:
+            votes = [(vote.vote_authority, vote.slots[-1]) for vote in votes]
+        aggregator.add(i, slot, votes)
+    return aggregator.result()
+
+
+def get_fields(aggregators: List[Aggregator]):
+    fields = set()
+    for aggregator in aggregators:
+        if aggregator.fields is None:
+            return None
+        fields |= aggregator.fields
+    return fields
+
+
+def scan_chunk(
+    data_dir: Path,
+    epoch: int,
+    slot_range: List[int],
+    aggregators: List[Aggregator],
+    offset: int = 0,
+    progress: bool = False,
+    cache: bool = False,
+):
+    reader = BlockReader(data_dir, epoch)
+    fields = get_fields(aggregators)
+
+    metrics_cache, cached, new_values = None, {}, []
+    if cache and slot_range:
+        metrics_cache = MetricsCache(get_metrics_cache_file(data_dir))
+        cached = metrics_cache.get(epoch, slot_range[0], slot_range[-1])
+
+    slots = tqdm(slot_range) if progress else slot_range
+    for i, slot in enumerate(slots, start=offset):
+        exists = reader.exists(slot)
+
+        values = {}
+        if exists and metrics_cache is not None:
+            fingerprint = reader.fingerprint(slot)
+            slot_cached = cached.get(slot, {})
+            values = {
+                cache_key: value
+                for cache_key, (cached_fingerprint, value) in slot_cached.items()
+                if cached_fingerprint == fingerprint
+            }
+
+        # the block is only parsed if some aggregator has no cached value
+        block = None
+        if exists and any(
+            aggregator.cache_key is None or aggregator.cache_key not in values
+            for aggregator in aggregators
+        ):
+            block = reader.read(slot, fields)
+
+        for aggregator in aggregators:
+            value = None
+            if aggregator.cache_key in values:
+                value = values[aggregator.cache_key]
+            elif exists:
+                value = aggregator.extract(block)
+                if metrics_cache is not None and aggregator.cache_key is not None:
+                    new_values.append((slot, aggregator.cache_key, fingerprint, value))
+            aggregator.add(i, slot, value)
+
+    if metrics_cache is not None:
+        metrics_cache.put(epoch, new_values)
+        metrics_cache.close()
+
+    return aggregators
+
+
+def scan(
+    data_dir: Path,
+    epoch: int,
+    slot_range: List[int],
+    aggregators: List[Aggregator],
+    workers: int = 1,
+    cache: bool = False,
+):
+    if workers <= 1:
+        scan_chunk(data_dir, epoch, slot_range, aggregators, progress=True, cache=cache)
+        return [aggregator.result() for aggregator in aggregators]
+
+    # a few chunks per worker keep them all busy until the end
+    chunk_size = max(1, -(-len(slot_range) // (CHUNKS_PER_WORKER * workers)))
+    offsets = list(range(0, len(slot_range), chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks_aggregators = executor.map(
+            scan_chunk,
+            repeat(data_dir),
+            repeat(epoch),
+            [slot_range[offset : offset + chunk_size] for offset in offsets],
+            [deepcopy(aggregators) for _ in offsets],
+            offsets,
+            repeat(False),
+            repeat(cache),
+        )
+        # map yields the chunks in slot order, so they merge in order too
+        for chunk_aggregators in tqdm(chunks_aggregators, total=len(offsets)):
+            for aggregator, chunk_aggregator in zip(aggregators, chunk_aggregators):
+                aggregator.merge(chunk_aggregator)
+
+    return [aggregator.result() for aggregator in aggregators]
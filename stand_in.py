@@ -0,0 +1,245 @@
+import argparse
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from utils.constants import *
+from utils.synthetic import SLOT_TIME, SyntheticCluster
+
+# A local JSON-RPC server standing in for a Solana cluster, for testing and
+# benchmarking the dumper without hitting the public endpoints. Blocks come
+# from recorded getBlock results when there is one for the slot and are
+# generated otherwise, the tip moves forward in real time.
+
+# slots the finalized tip lags behind the confirmed one
+FINALITY_LAG = 32
+
+BLOCK_NOT_AVAILABLE = -32004
+SLOT_SKIPPED = -32007
+METHOD_NOT_FOUND = -32601
+INVALID_REQUEST = -32600
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        self.code = code
+        self.message = message
+
+
+class StandIn:
+    def __init__(
+        self,
+        cluster: SyntheticCluster,
+        epoch: int = 1,
+        slot_time: float = SLOT_TIME,
+        latency: float = 0,
+        error_rate: float = 0,
+        orphan_rate: float = 0,
+        batches: bool = True,
+        record_dir: Optional[Path] = None,
+    ):
+        self.cluster = cluster
+        self.slot_time = slot_time
+        self.latency = latency
+        self.error_rate = error_rate
+        self.orphan_rate = orphan_rate
+        # like endpoints behind proxies that turn JSON-RPC batches down
+        self.batches = batches
+        self.record_dir = record_dir
+        # the tip starts at the beginning of the given epoch
+        self.start_slot = epoch * cluster.slots_per_epoch + FINALITY_LAG
+        self.started = time.monotonic()
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def get_slot(self, commitment: Optional[str] = None):
+        slot = self.start_slot
+        if self.slot_time > 0:
+            slot += int((time.monotonic() - self.started) / self.slot_time)
+        if commitment == FINALIZED or commitment is None:
+            slot -= FINALITY_LAG
+        return slot
+
+    def _failed(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    @lru_cache(maxsize=1024)
+    def get_block_bytes(self, slot: int):
+        if self.record_dir is not None:
+            block_file = self.record_dir / f"{slot}.json"
+            if block_file.exists():
+                return block_file.read_bytes()
+        return json.dumps(self.cluster.get_block(slot)).encode()
+
+    def is_orphaned(self, slot: int):
+        # blocks of a fork that gets abandoned, served while only confirmed and
+        # skipped once finalized
+        rng = random.Random(f"{self.cluster.seed}-{slot}-orphaned")
+        return rng.random() < self.orphan_rate and not self.cluster.is_skipped(slot)
+
+    def get_block(self, slot: int, config=None):
+        commitment = config.get(COMMITMENT) if isinstance(config, dict) else None
+        if slot > self.get_slot(commitment) or self._failed():
+            raise RPCError(BLOCK_NOT_AVAILABLE, f"Block not available for slot {slot}")
+        if self.cluster.is_skipped(slot) or (
+            self.is_orphaned(slot) and commitment != CONFIRMED
+        ):
+            raise RPCError(SLOT_SKIPPED, f"Slot {slot} was skipped")
+        return self.get_block_bytes(slot)
+
+    def get_blocks(self, start_slot: int, end_slot: Optional[int] = None, *_):
+        if end_slot is None or end_slot > self.get_slot():
+            end_slot = self.get_slot()
+        return [
+            slot
+            for slot in range(start_slot, end_slot + 1)
+            if not self.cluster.is_skipped(slot) and not self.is_orphaned(slot)
+        ]
+
+    def get_epoch_info(self, *_):
+        slot = self.get_slot()
+        slots_per_epoch = self.cluster.slots_per_epoch
+        return {
+            "absoluteSlot": slot,
+            "blockHeight": slot,
+            EPOCH: self.cluster.get_epoch(slot),
+            "slotIndex": slot % slots_per_epoch,
+            "slotsInEpoch": slots_per_epoch,
+        }
+
+    def get_epoch_schedule(self, *_):
+        return {
+            **self.cluster.get_epoch_schedule(),
+            "leaderScheduleSlotOffset": self.cluster.slots_per_epoch,
+            "warmup": False,
+        }
+
+    @lru_cache(maxsize=4)
+    def _get_epoch_leader_schedule(self, epoch: int):
+        return self.cluster.get_leader_schedule(epoch)
+
+    def get_leader_schedule(self, slot: Optional[int] = None, *_):
+        if slot is None:
+            slot = self.get_slot()
+        return self._get_epoch_leader_schedule(self.cluster.get_epoch(slot))
+
+    def handle(self, request):
+        # responses are built as bytes, so cached blocks are not encoded again
+        methods = {
+            "getBlock": self.get_block,
+            "getBlocks": self.get_blocks,
+            "getSlot": lambda config=None: self.get_slot(
+                config.get(COMMITMENT) if config else None
+            ),
+            "getEpochInfo": self.get_epoch_info,
+            "getEpochSchedule": self.get_epoch_schedule,
+            "getLeaderSchedule": self.get_leader_schedule,
+        }
+        request_id = json.dumps(request.get(ID)).encode()
+        try:
+            method = methods.get(request.get("method"))
+            if method is None:
+                raise RPCError(METHOD_NOT_FOUND, "Method not found")
+            result = method(*request.get("params", []))
+            if not isinstance(result, bytes):
+                result = json.dumps(result).encode()
+            return b'{"jsonrpc":"2.0","result":%s,"id":%s}' % (result, request_id)
+        except RPCError as e:
+            error = json.dumps({CODE: e.code, "message": e.message}).encode()
+            return b'{"jsonrpc":"2.0","error":%s,"id":%s}' % (error, request_id)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    stand_in: StandIn = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.stand_in.latency > 0:
+            time.sleep(self.stand_in.latency)
+
+        if isinstance(body, list) and not self.stand_in.batches:
+            response = json.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    ERROR: {CODE: INVALID_REQUEST, "message": "Batch not supported"},
+                    ID: None,
+                }
+            ).encode()
+        elif isinstance(body, list):
+            response = b"[%s]" % b",".join(
+                self.stand_in.handle(request) for request in body
+            )
+        else:
+            response = self.stand_in.handle(body)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+def make_server(stand_in: StandIn, host: str = "127.0.0.1", port: int = 0):
+    handler = type("Handler", (StandInHandler,), {"stand_in": stand_in})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stand_in(stand_in: StandIn, host: str = "127.0.0.1", port: int = 0):
+    # serves in a background thread, port 0 picks a free port
+    server = make_server(stand_in, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument("--host", type=str, default="127.0.0.1")
+    CLI.add_argument("--port", type=int, default=8899)
+    CLI.add_argument("--epoch", type=int, default=1)
+    CLI.add_argument("--slots-per-epoch", type=int, default=432000)
+    CLI.add_argument("--slot-time", type=float, default=SLOT_TIME)
+    CLI.add_argument("--latency", type=float, default=0)
+    CLI.add_argument("--error-rate", type=float, default=0)
+    CLI.add_argument("--orphan-rate", type=float, default=0)
+    CLI.add_argument("--no-batches", action="store_true")
+    CLI.add_argument("--skip-rate", type=float, default=0.05)
+    CLI.add_argument("--transactions", type=int, default=200)
+    CLI.add_argument("--validators", type=int, default=100)
+    CLI.add_argument("--seed", type=int, default=0)
+    CLI.add_argument("--record-dir", type=str)
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    cluster = SyntheticCluster(
+        seed=args.seed,
+        validators=args.validators,
+        transactions=args.transactions,
+        skip_rate=args.skip_rate,
+        slots_per_epoch=args.slots_per_epoch,
+    )
+    stand_in = StandIn(
+        cluster,
+        epoch=args.epoch,
+        slot_time=args.slot_time,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        orphan_rate=args.orphan_rate,
+        batches=not args.no_batches,
+        record_dir=Path(args.record_dir) if args.record_dir else None,
+    )
+    server = make_server(stand_in, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+# Values aggregators extract from a block are cached by epoch, slot and metric,
+# along with the fingerprint of the block they came from. A cached value is
+# only used while the block on disk still has the same fingerprint, and the
+# least recently used values are evicted once the values stored take too much
+# space. Triggers keep the total size of the values, so it is never recounted.
+
+CACHE_MAX_BYTES = 2**30
+# evicting goes below the bound, so it is not needed again on the next write
+EVICT_TO = 0.9
+
+
+class MetricsCache:
+    def __init__(self, cache_file: Path, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # scan workers share the cache, writers wait for each other
+        self._db = sqlite3.connect(cache_file, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # so the rows INSERT OR REPLACE deletes fire the delete trigger
+        self._db.execute("PRAGMA recursive_triggers=ON")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "epoch INTEGER, slot INTEGER, metric TEXT, fingerprint TEXT, "
+            "value TEXT, used INTEGER, PRIMARY KEY (epoch, slot, metric));"
+            "CREATE INDEX IF NOT EXISTS metrics_used ON metrics (used);"
+            "CREATE TABLE IF NOT EXISTS metrics_size ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER);"
+            "CREATE TRIGGER IF NOT EXISTS metrics_insert AFTER INSERT ON metrics "
+            "BEGIN UPDATE metrics_size SET bytes = bytes + length(NEW.value); END;"
+            "CREATE TRIGGER IF NOT EXISTS metrics_delete AFTER DELETE ON metrics "
+            "BEGIN UPDATE metrics_size SET bytes = bytes - length(OLD.value); END;"
+        )
+        with self._db:
+            # caches from before the total was kept start from their content
+            self._db.execute(
+                "INSERT OR IGNORE INTO metrics_size "
+                "SELECT 0, COALESCE(SUM(length(value)), 0) FROM metrics"
+            )
+
+    def get(self, epoch: int, low_slot: int, up_slot: int):
+        # every cached value of the slots in [low_slot, up_slot], by slot and
+        # then by metric, with the fingerprint of its block
+        cached = {}
+        rows = self._db.execute(
+            "SELECT slot, metric, fingerprint, value FROM metrics "
+            "WHERE epoch = ? AND slot BETWEEN ? AND ?",
+            (epoch, low_slot, up_slot),
+        )
+        for slot, metric, fingerprint, value in rows:
+            cached.setdefault(slot, {})[metric] = (fingerprint, json.loads(value))
+
+        with self._db:
+            self._db.execute(
+                "UPDATE metrics SET used = ? WHERE epoch = ? AND slot BETWEEN ? AND ?",
+                (time.time_ns(), epoch, low_slot, up_slot),
+            )
+        return cached
+
+    def put(self, epoch: int, values: List[Tuple[int, str, str, object]]):
+        # values are (slot, metric, fingerprint, value)
+        if not values:
+            return
+        used = time.time_ns()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (epoch, slot, metric, fingerprint, json.dumps(value), used)
+                    for slot, metric, fingerprint, value in values
+                ],
+            )
+        self.evict()
+
+    def size(self):
+        (n_bytes,) = self._db.execute("SELECT bytes FROM metrics_size").fetchone()
+        return n_bytes
+
+    def evict(self):
+        n_bytes = self.size()
+        if n_bytes <= self.max_bytes:
+            return
+        excess = n_bytes - int(self.max_bytes * EVICT_TO)
+        # the oldest values are read along the index until they free enough
+        rowids = []
+        rows = self._db.execute(
+            "SELECT rowid, length(value) FROM metrics ORDER BY used"
+        )
+        for rowid, value_bytes in rows:
+            if excess <= 0:
+                break
+            rowids.append((rowid,))
+            excess -= value_bytes
+        rows.close()
+        with self._db:
+            self._db.executemany("DELETE FROM metrics WHERE rowid = ?", rowids)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
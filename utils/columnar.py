@@ -0,0 +1,335 @@
+import json
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+from .constants import *
+from .journal import read_journal
+from .manifest import load_manifest
+
+BLOCKS_TABLE = "blocks"
+TRANSACTIONS_TABLE = "transactions"
+ACCOUNT_TRANSACTIONS_TABLE = "account_transactions"
+INSTRUCTIONS_TABLE = "instructions"
+REWARDS_TABLE = "rewards"
+
+# every partition of a table holds the rows of this many consecutive slots
+PARTITION_SLOTS = 10000
+# buffered blocks are written out as a new part file once there are this many
+FLUSH_BLOCKS = 1000
+
+
+def _schemas():
+    return {
+        BLOCKS_TABLE: pa.schema(
+            [
+                ("slot", pa.int64()),
+                ("commitment", pa.string()),
+                ("blockhash", pa.string()),
+                ("previous_blockhash", pa.string()),
+                ("parent_slot", pa.int64()),
+                ("block_time", pa.int64()),
+                ("block_height", pa.int64()),
+                ("signatures", pa.list_(pa.string())),
+            ]
+        ),
+        TRANSACTIONS_TABLE: pa.schema(
+            [
+                ("slot", pa.int64()),
+                ("transaction_id", pa.string()),
+                ("signatures", pa.list_(pa.string())),
+                # arbitrary JSON error, null when the transaction succeeded
+                ("err", pa.string()),
+                ("fee", pa.int64()),
+            ]
+        ),
+        ACCOUNT_TRANSACTIONS_TABLE: pa.schema(
+            [
+                ("slot", pa.int64()),
+                ("transaction_id", pa.string()),
+                ("pubkey", pa.string()),
+                ("pre_balance", pa.int64()),
+                ("post_balance", pa.int64()),
+                ("read_only", pa.bool_()),
+                ("signed", pa.bool_()),
+                ("signature", pa.string()),
+            ]
+        ),
+        INSTRUCTIONS_TABLE: pa.schema(
+            [
+                ("slot", pa.int64()),
+                ("transaction_id", pa.string()),
+                ("instruction_idx", pa.int32()),
+                ("program_account", pa.string()),
+                ("program_name", pa.string()),
+                ("accounts", pa.list_(pa.string())),
+                # raw data string or parsed instruction, JSON encoded
+                ("data", pa.string()),
+            ]
+        ),
+        REWARDS_TABLE: pa.schema(
+            [
+                ("slot", pa.int64()),
+                # null for block rewards
+                ("transaction_id", pa.string()),
+                ("pubkey", pa.string()),
+                ("lamports", pa.int64()),
+                ("post_balance", pa.int64()),
+                ("reward_type", pa.string()),
+                ("commission", pa.int64()),
+            ]
+        ),
+    }
+
+
+def get_columnar_dir(data_dir: Path, epoch: int):
+    return data_dir / str(epoch) / "columnar"
+
+
+def get_columnar_journal_file(data_dir: Path, epoch: int):
+    # slots are journaled apart from the json dumps, once flushed to the store
+    return get_columnar_dir(data_dir, epoch) / "dump_journal.jsonl"
+
+
+def has_columnar_store(data_dir: Path, epoch: int, slot_range: List[int]):
+    # the store serves a range only if it holds every block on disk in it
+    journal_file = get_columnar_journal_file(data_dir, epoch)
+    if not journal_file.exists():
+        return False
+    statuses = read_journal(journal_file)
+    manifest = load_manifest(data_dir, epoch)
+    return not any(
+        slot in manifest and statuses.get(slot) != DONE for slot in slot_range
+    )
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar store")
+
+
+def _partition_name(slot: int):
+    first_slot = slot - slot % PARTITION_SLOTS
+    return f"{first_slot}-{first_slot + PARTITION_SLOTS - 1}"
+
+
+def _reward_row(slot, transaction_id, reward):
+    return {
+        "slot": slot,
+        "transaction_id": transaction_id,
+        "pubkey": reward.get(PUBKEY),
+        "lamports": reward.get(LAMPORTS),
+        "post_balance": reward.get(POST_BALANCE),
+        "reward_type": reward.get(REWARD_TYPE),
+        "commission": reward.get(COMMISSION),
+    }
+
+
+def block_rows(block) -> Dict[str, List[dict]]:
+    slot = block.slot
+    rows = {
+        BLOCKS_TABLE: [
+            {
+                "slot": slot,
+                "commitment": block.commitment,
+                "blockhash": block.blockhash,
+                "previous_blockhash": block.previous_blockhash,
+                "parent_slot": block.parent_slot,
+                "block_time": block.block_time,
+                "block_height": block.block_height,
+                "signatures": block.signatures,
+            }
+        ],
+        TRANSACTIONS_TABLE: [],
+        ACCOUNT_TRANSACTIONS_TABLE: [],
+        INSTRUCTIONS_TABLE: [],
+        REWARDS_TABLE: [
+            _reward_row(slot, None, reward) for reward in block.rewards or []
+        ],
+    }
+    for tr in block.transactions:
+        transaction_id = tr.signatures[0]
+        rows[TRANSACTIONS_TABLE].append(
+            {
+                "slot": slot,
+                "transaction_id": transaction_id,
+                "signatures": tr.signatures,
+                "err": None if tr.err is None else json.dumps(tr.err),
+                "fee": tr.fee,
+            }
+        )
+        rows[ACCOUNT_TRANSACTIONS_TABLE] += [
+            {
+                "slot": slot,
+                "transaction_id": transaction_id,
+                "pubkey": tr_acc.pubkey,
+                "pre_balance": tr_acc.pre_balance,
+                "post_balance": tr_acc.post_balance,
+                "read_only": tr_acc.read_only,
+                "signed": tr_acc.signed,
+                "signature": tr_acc.signature,
+            }
+            for tr_acc in tr.transaction_accounts
+        ]
+        rows[INSTRUCTIONS_TABLE] += [
+            {
+                "slot": slot,
+                "transaction_id": transaction_id,
+                "instruction_idx": idx,
+                "program_account": tr_inst.program_account,
+                "program_name": tr_inst.program_name,
+                "accounts": tr_inst.accounts,
+                "data": json.dumps(tr_inst.data),
+            }
+            for idx, tr_inst in enumerate(tr.transaction_instructions)
+        ]
+        rows[REWARDS_TABLE] += [
+            _reward_row(slot, transaction_id, reward) for reward in tr.rewards or []
+        ]
+    return rows
+
+
+class ColumnarWriter:
+    def __init__(
+        self,
+        columnar_dir: Path,
+        flush_blocks: int = FLUSH_BLOCKS,
+        on_flush: Optional[Callable[[List[int]], None]] = None,
+    ):
+        _require_pyarrow()
+        self.columnar_dir = columnar_dir
+        self.flush_blocks = flush_blocks
+        self.on_flush = on_flush
+        self.schemas = _schemas()
+        # partition -> (buffered slots, table -> buffered rows)
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def add_block(self, block):
+        rows = block_rows(block)
+        partition = _partition_name(block.slot)
+        with self._lock:
+            slots, tables = self._buffers.setdefault(
+                partition, ([], {table: [] for table in self.schemas})
+            )
+            slots.append(block.slot)
+            for table, table_rows in rows.items():
+                tables[table] += table_rows
+            if len(slots) >= self.flush_blocks:
+                self._flush_partition(partition)
+
+    def _flush_partition(self, partition: str):
+        slots, tables = self._buffers.pop(partition)
+        part_id = uuid.uuid4().hex[:8]
+        for table, schema in self.schemas.items():
+            partition_dir = self.columnar_dir / table / partition
+            partition_dir.mkdir(parents=True, exist_ok=True)
+            part_file = partition_dir / f"part-{min(slots)}-{part_id}.parquet"
+            tmp_file = part_file.with_name(f".{part_file.name}.tmp")
+            pq.write_table(pa.Table.from_pylist(tables[table], schema=schema), tmp_file)
+            tmp_file.replace(part_file)
+        if self.on_flush is not None:
+            self.on_flush(slots)
+
+    def flush(self):
+        with self._lock:
+            for partition in list(self._buffers):
+                self._flush_partition(partition)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_table(
+    data_dir: Path,
+    epoch: int,
+    table: str,
+    columns: Optional[List[str]] = None,
+    slot_range: Optional[List[int]] = None,
+):
+    _require_pyarrow()
+    table_dir = get_columnar_dir(data_dir, epoch) / table
+    if columns is not None and "slot" not in columns:
+        columns = ["slot"] + columns
+
+    part_files = []
+    for partition_dir in sorted(table_dir.iterdir()):
+        first_slot, last_slot = map(int, partition_dir.name.split("-"))
+        # only open the partitions overlapping the requested range
+        if slot_range is not None and (
+            last_slot < slot_range[0] or first_slot > slot_range[-1]
+        ):
+            continue
+        part_files += sorted(partition_dir.glob("part-*.parquet"))
+
+    if not part_files:
+        return (
+            _schemas()[table].empty_table().select(columns or _schemas()[table].names)
+        )
+    data = pa.concat_tables(
+        [pq.read_table(part_file, columns=columns) for part_file in part_files]
+    )
+    if slot_range is not None:
+        data = data.filter(
+            pc.and_(
+                pc.greater_equal(data["slot"], slot_range[0]),
+                pc.less_equal(data["slot"], slot_range[-1]),
+            )
+        )
+    return data
+
+
+def _sum_by_slot(slots, values, slot_range):
+    grouped = (
+        pa.table({"slot": slots, "value": values})
+        .group_by("slot")
+        .aggregate([("value", "sum")])
+    )
+    sums = dict(zip(grouped["slot"].to_pylist(), grouped["value_sum"].to_pylist()))
+    return {slot: sums.get(slot) or 0 for slot in slot_range}
+
+
+def get_transaction_counts(data_dir: Path, epoch: int, slot_range: List[int]):
+    data = read_table(data_dir, epoch, TRANSACTIONS_TABLE, ["err"], slot_range)
+    ones = pa.array([1] * len(data), pa.int64())
+    failed = pc.cast(pc.is_valid(data["err"]), pa.int64())
+    return (
+        _sum_by_slot(data["slot"], ones, slot_range),
+        _sum_by_slot(data["slot"], failed, slot_range),
+    )
+
+
+def get_rent(data_dir: Path, epoch: int, slot_range: List[int]):
+    data = read_table(
+        data_dir,
+        epoch,
+        REWARDS_TABLE,
+        ["transaction_id", "reward_type", "lamports"],
+        slot_range,
+    )
+    # rent collected by the block, as RentAggregator counts it, without the
+    # rewards of its transactions
+    data = data.filter(
+        pc.and_(pc.equal(data["reward_type"], RENT), pc.is_null(data["transaction_id"]))
+    )
+    lamports = data["lamports"]
+    collected = pc.if_else(pc.less(lamports, 0), pc.negate(lamports), 0)
+    given = pc.if_else(pc.greater(lamports, 0), lamports, 0)
+    return (
+        _sum_by_slot(data["slot"], collected, slot_range),
+        _sum_by_slot(data["slot"], given, slot_range),
+    )
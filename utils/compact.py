@@ -0,0 +1,148 @@
+from array import array
+from typing import Iterable
+
+import numpy as np
+
+from .constants import PUBKEY
+from .keys import KeyDictionary
+
+# A slot range held as flat columns instead of millions of model objects: one
+# row per transaction, one per account of a transaction and one per
+# instruction, with pubkeys and programs as ids of the epoch key dictionary.
+# Rows of the nested columns point at their transaction by position.
+
+COMPACT_FIELDS = frozenset(
+    {
+        "transactions.signatures",
+        "transactions.err",
+        "transactions.fee",
+        "transactions.transaction_accounts",
+        "transactions.transaction_instructions",
+    }
+)
+
+
+class CompactBlocks:
+    def __init__(
+        self,
+        keys: KeyDictionary,
+        signatures,
+        tx_slots,
+        fees,
+        failed,
+        account_tx,
+        accounts,
+        pre_balances,
+        post_balances,
+        writable,
+        signer,
+        instruction_tx,
+        programs,
+    ):
+        self.keys = keys
+        # by transaction
+        self.signatures = signatures
+        self.tx_slots = tx_slots
+        self.fees = fees
+        self.failed = failed
+        # by account of a transaction
+        self.account_tx = account_tx
+        self.accounts = accounts
+        self.pre_balances = pre_balances
+        self.post_balances = post_balances
+        self.writable = writable
+        self.signer = signer
+        # by instruction
+        self.instruction_tx = instruction_tx
+        self.programs = programs
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable, keys: KeyDictionary, instructions=True):
+        # typed arrays grow without a python object per value
+        signatures = []
+        tx_slots, fees, failed = array("q"), array("q"), array("b")
+        account_tx, accounts = array("i"), array("i")
+        pre_balances, post_balances = array("q"), array("q")
+        writable, signer = array("b"), array("b")
+        instruction_tx, programs = array("i"), array("i")
+
+        for block in blocks:
+            for transaction in block.transactions:
+                tx = len(signatures)
+                signatures.append(transaction.signatures[0])
+                tx_slots.append(block.slot)
+                fees.append(transaction.fee or 0)
+                failed.append(transaction.err is not None)
+                for tr_acc in transaction.transaction_accounts:
+                    account_tx.append(tx)
+                    accounts.append(keys.id(tr_acc.pubkey))
+                    pre_balances.append(tr_acc.pre_balance)
+                    post_balances.append(tr_acc.post_balance)
+                    writable.append(not tr_acc.read_only)
+                    signer.append(bool(tr_acc.signed))
+                if not instructions:
+                    continue
+                for tr_inst in transaction.transaction_instructions:
+                    program = tr_inst.program_account
+                    if isinstance(program, dict):
+                        program = program[PUBKEY]
+                    instruction_tx.append(tx)
+                    programs.append(keys.id(program))
+
+        return cls(
+            keys,
+            signatures,
+            np.frombuffer(tx_slots, dtype=np.int64),
+            np.frombuffer(fees, dtype=np.int64),
+            np.frombuffer(failed, dtype=np.int8).astype(bool),
+            np.frombuffer(account_tx, dtype=np.int32),
+            np.frombuffer(accounts, dtype=np.int32),
+            np.frombuffer(pre_balances, dtype=np.int64),
+            np.frombuffer(post_balances, dtype=np.int64),
+            np.frombuffer(writable, dtype=np.int8).astype(bool),
+            np.frombuffer(signer, dtype=np.int8).astype(bool),
+            np.frombuffer(instruction_tx, dtype=np.int32),
+            np.frombuffer(programs, dtype=np.int32),
+        )
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def remap_keys(self, remap: np.ndarray):
+        self.accounts = remap[self.accounts]
+        self.programs = remap[self.programs]
+
+    def tx_indexes(self):
+        # position of every transaction in its block, blocks being added in
+        # slot order
+        return np.arange(len(self.tx_slots)) - np.searchsorted(
+            self.tx_slots, self.tx_slots
+        )
+
+    def key_indexes(self):
+        # position of every account in its transaction
+        return np.arange(len(self.account_tx)) - np.searchsorted(
+            self.account_tx, self.account_tx
+        )
+
+    def account_rows(self, pubkey: str):
+        if pubkey not in self.keys:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.accounts == self.keys.id(pubkey))
+
+    def balance_history(self, pubkey: str):
+        # slots, balances before and after of every transaction of the account
+        rows = self.account_rows(pubkey)
+        return (
+            self.tx_slots[self.account_tx[rows]],
+            self.pre_balances[rows],
+            self.post_balances[rows],
+        )
+
+    def program_counts(self):
+        # number of instructions by program
+        counts = np.bincount(self.programs, minlength=len(self.keys))
+        return {
+            self.keys.key(key_id): int(counts[key_id])
+            for key_id in np.flatnonzero(counts)
+        }
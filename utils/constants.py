@@ -7,6 +7,7 @@ CONFIRMED = "confirmed"
 PROCESSED = "processed"
 
 COMMITMENT = "commitment"
+ENCODING = "encoding"
 TOTAL_STAKE = "totalStake"
 SLOT = "slot"
 BLOCKHASH = "blockhash"
@@ -16,6 +17,7 @@ BLOCK_HEIGHT = "blockHeight"
 REWARDS = "rewards"
 TRANSACTIONS = "transactions"
 TRANSACTION = "transaction"
+BLOCK = "block"
 BLOCK_TIME = "blockTime"
 SIGNATURES = "signatures"
 META = "meta"
@@ -40,6 +42,8 @@ ACCOUNTS = "accounts"
 PROGRAM_ID_INDEX = "programIdIndex"
 LAMPORTS = "lamports"
 REWARD_TYPE = "rewardType"
+POST_BALANCE = "postBalance"
+COMMISSION = "commission"
 RENT = "Rent"
 EPOCH = "epoch"
 FIRST_NORMAL_EPOCH = "firstNormalEpoch"
@@ -53,11 +57,41 @@ SIGNER = "signer"
 VOTE_PROGRAM_ACCOUNT = "Vote111111111111111111111111111111111111111"
 INFO = "info"
 VOTE_AUTHORITY = "voteAuthority"
+VOTE_ACCOUNT = "voteAccount"
+HASH = "hash"
+TIMESTAMP = "timestamp"
 VOTE = "vote"
 SLOTS = "slots"
 TYPE = "type"
 VOTES = "votes"
 FIRST_VOTE = "first_vote"
 
+# dump journal statuses
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+STATUS = "status"
+
+# failed slots are retried with exponential backoff, in seconds
+RETRIES = 5
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+
+# getBlock errors meaning the slot has no block and never will
+SKIPPED_SLOT_ERRORS = (-32007, -32009)
+
+# getBlocks refuses ranges wider than this
+MAX_BLOCKS_RANGE = 500000
+
+# follow mode, seconds between polls of the cluster tip
+FOLLOW_POLL_INTERVAL = 1
+NEXT_SLOT = "next_slot"
+MISSING = "missing"
+# polls a finalized slot can fail in before it is recorded as failed
+FOLLOW_RETRIES = 5
+ATTEMPTS = "attempts"
 
 RESULT = "result"
+ID = "id"
+ERROR = "error"
+CODE = "code"
@@ -1,5 +1,76 @@
+import json
+import os
+from pathlib import Path
+
+
+def get_blocks_dir(data_dir, epoch):
+    return data_dir / str(epoch) / "blocks"
+
+
 def get_block_file(data_dir, epoch, slot):
-    return data_dir / str(epoch) / "blocks" / f"{slot}.json"
+    return get_blocks_dir(data_dir, epoch) / f"{slot}.json"
+
 
 def get_leader_schedule_file(data_dir, epoch):
-    return data_dir / str(epoch) / "leader_schedule.json"
\ No newline at end of file
+    return data_dir / str(epoch) / "leader_schedule.json"
+
+
+def get_leader_schedule_array_file(data_dir, epoch):
+    return data_dir / str(epoch) / "leader_schedule.npz"
+
+
+def get_skipped_slots_file(data_dir, epoch):
+    return data_dir / str(epoch) / "skipped_slots.json"
+
+
+def get_dump_journal_file(data_dir, epoch):
+    return data_dir / str(epoch) / "dump_journal.jsonl"
+
+
+def get_vote_table_file(data_dir, epoch):
+    return data_dir / str(epoch) / "vote_table.jsonl"
+
+
+def get_vote_table_index_file(data_dir, epoch):
+    return data_dir / str(epoch) / "vote_table_index.npz"
+
+
+def get_manifest_file(data_dir, epoch):
+    return data_dir / str(epoch) / "manifest.npz"
+
+
+def get_keys_file(data_dir, epoch):
+    return data_dir / str(epoch) / "keys.json"
+
+
+def get_shards_dir(data_dir, epoch):
+    return data_dir / str(epoch) / "shards"
+
+
+def get_shard_plan_file(data_dir, epoch):
+    return data_dir / str(epoch) / "shards.json"
+
+
+def get_metrics_cache_file(data_dir):
+    return data_dir / "metrics_cache.sqlite"
+
+
+def get_account_index_file(data_dir):
+    return data_dir / "account_index.sqlite"
+
+
+def get_follow_state_file(data_dir):
+    return data_dir / "follow_state.json"
+
+
+def write_bytes_atomic(path: Path, data: bytes):
+    # readers never see a half written file, it is either absent or complete,
+    # and processes writing the same file do not share a temporary one
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as fp:
+        fp.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path: Path, obj):
+    write_bytes_atomic(path, json.dumps(obj).encode())
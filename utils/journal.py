@@ -0,0 +1,60 @@
+import json
+import threading
+from pathlib import Path
+from typing import Container, List, Optional
+
+from .constants import *
+
+
+def read_journal(journal_file: Path):
+    statuses = {}
+    if journal_file.exists():
+        for line in journal_file.read_text().splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # last line may be cut short if the dumper crashed
+                continue
+            statuses[entry[SLOT]] = entry[STATUS]
+    return statuses
+
+
+class DumpJournal:
+    def __init__(self, journal_file: Path):
+        self.journal_file = journal_file
+        self.statuses = read_journal(journal_file)
+        journal_file.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = open(journal_file, "a")
+        self._lock = threading.Lock()
+
+    def record(self, slot: int, status: str):
+        with self._lock:
+            self.statuses[slot] = status
+            self._fp.write(json.dumps({SLOT: slot, STATUS: status}) + "\n")
+            self._fp.flush()
+
+    def record_many(self, slots: List[int], status: str):
+        for slot in slots:
+            self.record(slot, status)
+
+    def pending(self, slots: List[int], present: Optional[Container[int]] = None):
+        # without the slots present on disk to check against, done slots are
+        # trusted as is
+        return [
+            slot
+            for slot in slots
+            if not (
+                self.statuses.get(slot) == SKIPPED
+                or self.statuses.get(slot) == DONE
+                and (present is None or slot in present)
+            )
+        ]
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
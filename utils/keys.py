@@ -0,0 +1,69 @@
+import fcntl
+import json
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from .file import write_json_atomic
+
+# The same few hundred thousand pubkeys and programs come back in every block
+# of an epoch. A key dictionary gives each one a small integer id, stable once
+# assigned, so columns hold ids instead of copies of base58 strings. Processes
+# adding keys to the same dictionary merge them on save under a lock.
+
+
+class KeyDictionary:
+    def __init__(self, keys: Iterable[str] = ()):
+        self.keys = []
+        self.ids = {}
+        for key in keys:
+            self.id(key)
+        self._n_saved = len(self.keys)
+
+    @classmethod
+    def load(cls, keys_file: Path):
+        if not keys_file.exists():
+            return cls()
+        return cls(json.loads(keys_file.read_text()))
+
+    def save(self, keys_file: Path):
+        # the keys saved by others since the load keep their ids, the ones
+        # added here may move after them, and the returned array maps every id
+        # given here to the saved one
+        remap = np.arange(len(self.keys), dtype=np.int32)
+        if len(self.keys) == self._n_saved:
+            return remap
+
+        lock_file = keys_file.with_name(f".{keys_file.name}.lock")
+        with open(lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            added = self.keys[self._n_saved :]
+            saved = json.loads(keys_file.read_text()) if keys_file.exists() else []
+            self.keys = []
+            self.ids = {}
+            for key in saved:
+                self.id(key)
+            remap[self._n_saved :] = [self.id(key) for key in added]
+            write_json_atomic(keys_file, self.keys)
+        self._n_saved = len(self.keys)
+        return remap
+
+    def id(self, key: str):
+        key_id = self.ids.get(key)
+        if key_id is None:
+            key_id = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return key_id
+
+    def ids_of(self, keys: Iterable[str]):
+        return np.fromiter((self.id(key) for key in keys), dtype=np.int32)
+
+    def key(self, key_id: int):
+        return self.keys[key_id]
+
+    def __contains__(self, key: str):
+        return key in self.ids
+
+    def __len__(self):
+        return len(self.keys)
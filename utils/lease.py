@@ -0,0 +1,103 @@
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+# A lease is a file claiming a piece of work for one worker, created with
+# O_EXCL so only one worker can hold it. The holder keeps touching it, and a
+# lease whose mtime is older than its time to live belongs to a dead worker
+# and can be reclaimed by another one.
+
+LEASE_TTL = 300
+
+WORKER = "worker"
+CLAIMED = "claimed"
+
+
+def get_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def get_lease_holder(lease_file: Path):
+    try:
+        return json.loads(lease_file.read_text()).get(WORKER)
+    except (FileNotFoundError, ValueError):
+        # the lease is released, or its holder is still writing it
+        return None
+
+
+def is_lease_expired(lease_file: Path, ttl: float = LEASE_TTL):
+    try:
+        return time.time() - lease_file.stat().st_mtime > ttl
+    except FileNotFoundError:
+        return False
+
+
+def acquire_lease(lease_file: Path, worker_id: str, ttl: float = LEASE_TTL):
+    if is_lease_expired(lease_file, ttl) and not reclaim_lease(
+        lease_file, worker_id, ttl
+    ):
+        return False
+    try:
+        fd = os.open(lease_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as fp:
+        json.dump({WORKER: worker_id, CLAIMED: time.time()}, fp)
+    return True
+
+
+def reclaim_lease(lease_file: Path, worker_id: str, ttl: float = LEASE_TTL):
+    # renaming is atomic, so of the workers reclaiming an expired lease only
+    # one moves it away
+    stale_file = lease_file.with_name(f"{lease_file.name}.{worker_id}.stale")
+    try:
+        os.rename(lease_file, stale_file)
+    except FileNotFoundError:
+        return False
+    if not is_lease_expired(stale_file, ttl):
+        # another worker reclaimed it in between, its fresh lease goes back
+        try:
+            os.link(stale_file, lease_file)
+        except FileExistsError:
+            pass
+        stale_file.unlink()
+        return False
+    tqdm.write(f"Reclaimed {lease_file.name} from {get_lease_holder(stale_file)}")
+    stale_file.unlink()
+    return True
+
+
+def release_lease(lease_file: Path, worker_id: str):
+    if get_lease_holder(lease_file) == worker_id:
+        lease_file.unlink(missing_ok=True)
+
+
+class LeaseHeartbeat:
+    def __init__(self, lease_file: Path, worker_id: str, ttl: float = LEASE_TTL):
+        self.lease_file = lease_file
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.ttl / 3):
+            if get_lease_holder(self.lease_file) != self.worker_id:
+                # the work goes on, dumping a slot twice is harmless
+                tqdm.write(f"Lost {self.lease_file.name} to another worker")
+                return
+            os.utime(self.lease_file)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        release_lease(self.lease_file, self.worker_id)
@@ -0,0 +1,125 @@
+import os
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+
+from .file import get_blocks_dir, get_manifest_file
+from .segment import Segment, get_segments_dir
+
+# The manifest of an epoch is a bitmap of the slots that have a block on disk,
+# either as a block file or inside a segment, so checking whether a slot was
+# produced never stats its block file.
+
+
+class SlotManifest:
+    def __init__(self, first_slot: int, present: np.ndarray):
+        self.first_slot = first_slot
+        self.present = present
+
+    @classmethod
+    def from_slots(cls, slots: Iterable[int]):
+        slots = np.fromiter(slots, dtype=np.int64)
+        if not len(slots):
+            return cls(0, np.zeros(0, dtype=bool))
+        first_slot = int(slots.min())
+        present = np.zeros(int(slots.max()) - first_slot + 1, dtype=bool)
+        present[slots - first_slot] = True
+        return cls(first_slot, present)
+
+    @classmethod
+    def load(cls, manifest_file: Path):
+        with np.load(manifest_file) as manifest:
+            n_slots = int(manifest["n_slots"])
+            present = np.unpackbits(manifest["bits"], count=n_slots).astype(bool)
+            return cls(int(manifest["first_slot"]), present)
+
+    def save(self, manifest_file: Path):
+        # scan workers may rebuild a stale manifest at the same time
+        tmp_name = f".{manifest_file.name}.{os.getpid()}.tmp"
+        tmp_file = manifest_file.with_name(tmp_name)
+        with open(tmp_file, "wb") as fp:
+            np.savez(
+                fp,
+                first_slot=self.first_slot,
+                n_slots=len(self.present),
+                bits=np.packbits(self.present),
+            )
+        os.replace(tmp_file, manifest_file)
+
+    def __contains__(self, slot: int):
+        offset = slot - self.first_slot
+        return 0 <= offset < len(self.present) and bool(self.present[offset])
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    def missing(self, slots: Iterable[int]):
+        slots = np.fromiter(slots, dtype=np.int64)
+        offsets = slots - self.first_slot
+        inside = (offsets >= 0) & (offsets < len(self.present))
+        present = np.zeros(len(slots), dtype=bool)
+        present[inside] = self.present[offsets[inside]]
+        return set(slots[~present].tolist())
+
+
+def _scan_block_slots(data_dir: Path, epoch: int, low_slot=None, up_slot=None):
+    # slots of the block files and segments, those of segments outside the
+    # bounds left unread
+    slots = []
+    blocks_dir = get_blocks_dir(data_dir, epoch)
+    if blocks_dir.exists():
+        with os.scandir(blocks_dir) as entries:
+            for entry in entries:
+                # temporary files of interrupted writes start with a dot
+                name = entry.name
+                if name.endswith(".json") and not name.startswith("."):
+                    slots.append(int(name[: -len(".json")]))
+
+    segments_dir = get_segments_dir(data_dir, epoch)
+    if segments_dir.exists():
+        for segment_file in segments_dir.glob("*.seg"):
+            first_slot, last_slot = map(int, segment_file.stem.split("-"))
+            if (low_slot is None or last_slot >= low_slot) and (
+                up_slot is None or first_slot <= up_slot
+            ):
+                slots.extend(Segment(segment_file).slots.tolist())
+    return slots
+
+
+def get_present_slots(data_dir: Path, epoch: int, slots: List[int]):
+    # the slots of a range with a block on disk, from one listing of the blocks
+    # dir and the segments overlapping the range
+    if not slots:
+        return set()
+    return set(slots).intersection(
+        _scan_block_slots(data_dir, epoch, min(slots), max(slots))
+    )
+
+
+def build_manifest(data_dir: Path, epoch: int):
+    manifest = SlotManifest.from_slots(_scan_block_slots(data_dir, epoch))
+    manifest_file = get_manifest_file(data_dir, epoch)
+    if manifest_file.parent.exists():
+        try:
+            manifest.save(manifest_file)
+        except OSError:
+            # a read only data dir is scanned on every load
+            pass
+    return manifest
+
+
+def _mtime(path: Path):
+    return path.stat().st_mtime_ns if path.exists() else 0
+
+
+def load_manifest(data_dir: Path, epoch: int):
+    # adding or removing blocks touches their directory, so a manifest older
+    # than the directories is rebuilt
+    manifest_file = get_manifest_file(data_dir, epoch)
+    if manifest_file.exists() and _mtime(manifest_file) > max(
+        _mtime(get_blocks_dir(data_dir, epoch)),
+        _mtime(get_segments_dir(data_dir, epoch)),
+    ):
+        return SlotManifest.load(manifest_file)
+    return build_manifest(data_dir, epoch)
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Optional
+
+from .file import write_bytes_atomic
+
+# Where the time of a dump goes: a latency histogram of every stage and a few
+# counters, shared by all the dump worker threads, and exported periodically as
+# a JSON summary or in the Prometheus text format.
+
+FETCH = "fetch"
+PARSE = "parse"
+SERIALIZE = "serialize"
+WRITE = "write"
+
+BLOCKS = "blocks"
+SKIPPED_BLOCKS = "skipped"
+FAILED_BLOCKS = "failed"
+RETRIED_BATCHES = "retries"
+RPC_ERRORS = "rpc_errors"
+BYTES_WRITTEN = "bytes_written"
+RESPONSE_BYTES = "response_bytes"
+
+JSON_FORMAT = "json"
+PROMETHEUS_FORMAT = "prometheus"
+
+# upper bounds of the latency histogram buckets, in seconds
+HISTOGRAM_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    float("inf"),
+)
+METRICS_INTERVAL = 10
+
+
+class DumpMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.stage_buckets = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float):
+        bucket = bisect_left(HISTOGRAM_BUCKETS, seconds)
+        with self._lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0) + seconds
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+            buckets = self.stage_buckets.setdefault(name, [0] * len(HISTOGRAM_BUCKETS))
+            buckets[bucket] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            return {
+                "elapsed": elapsed,
+                "blocks_per_second": self.counters.get(BLOCKS, 0) / elapsed,
+                "bytes_per_second": self.counters.get(BYTES_WRITTEN, 0) / elapsed,
+                "stages": {
+                    name: {
+                        "seconds": seconds,
+                        "calls": self.stage_calls[name],
+                        # observations up to each bucket bound, like prometheus
+                        "buckets": dict(
+                            zip(
+                                map(str, HISTOGRAM_BUCKETS),
+                                _cumulative(self.stage_buckets[name]),
+                            )
+                        ),
+                    }
+                    for name, seconds in self.stage_seconds.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix: str = "dump"):
+        summary = self.summary()
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for name, stage in summary["stages"].items():
+            for bound, n in stage["buckets"].items():
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(
+                    f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {n}'
+                )
+            lines.append(
+                f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]}'
+            )
+            lines.append(
+                f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["calls"]}'
+            )
+
+        for name, n in summary["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {n}")
+
+        lines.append(f"# TYPE {prefix}_elapsed_seconds gauge")
+        lines.append(f"{prefix}_elapsed_seconds {summary['elapsed']}")
+        return "\n".join(lines) + "\n"
+
+
+def _cumulative(counts):
+    total = 0
+    cumulative = []
+    for n in counts:
+        total += n
+        cumulative.append(total)
+    return cumulative
+
+
+def export_metrics(metrics: DumpMetrics, metrics_file: Path, format: str):
+    if format == PROMETHEUS_FORMAT:
+        text = metrics.to_prometheus()
+    else:
+        text = json.dumps(metrics.summary(), indent=2)
+    write_bytes_atomic(metrics_file, text.encode())
+
+
+class MetricsExporter:
+    def __init__(
+        self,
+        metrics: DumpMetrics,
+        metrics_file: Path,
+        format: str = JSON_FORMAT,
+        interval: float = METRICS_INTERVAL,
+    ):
+        self.metrics = metrics
+        self.metrics_file = metrics_file
+        self.format = format
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            export_metrics(self.metrics, self.metrics_file, self.format)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # the last export has the final numbers
+        self._stopped.set()
+        self._thread.join()
+        export_metrics(self.metrics, self.metrics_file, self.format)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def stage(metrics: Optional[DumpMetrics], name: str):
+    return nullcontext() if metrics is None else metrics.stage(name)
+
+
+def count(metrics: Optional[DumpMetrics], name: str, n: int = 1):
+    if metrics is not None:
+        metrics.count(name, n)
@@ -1,32 +1,72 @@
-from typing import Union
+from typing import Optional, Set, Union
 from pathlib import Path
 import json
+import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+
+def loads(jsonish: Union[str, bytes]):
+    if orjson is not None:
+        return orjson.loads(jsonish)
+    return json.loads(jsonish)
+
+
+# the same pubkeys and programs come back in every block, interned each one is
+# held once however many models point at it
+def intern_key(key):
+    return sys.intern(key) if isinstance(key, str) else key
+
+
+# a projection such as {"rewards", "transactions.err"} names the fields a caller
+# needs, returns whether the nested field `name` has to be built right away and
+# the projection to build it with (None meaning every field)
+def project_fields(fields: Optional[Set[str]], name: str):
+    if fields is None or name in fields:
+        return True, None
+    nested_fields = {
+        field[len(name) + 1 :] for field in fields if field.startswith(f"{name}.")
+    }
+    if nested_fields:
+        return True, nested_fields
+    return False, None
+
+
+# models declare every attribute in __slots__, so instances carry no __dict__,
+# which adds up over the millions of them a slot range loads
 class JSONable:
+    __slots__ = ()
+
     @classmethod
-    def from_dict(cls, dict: dict):
+    def from_dict(cls, dict: dict, **kwargs):
         raise NotImplementedError
 
     @classmethod
-    def from_json(cls, jsonish: Union[str, Path, dict]):
+    def from_json(cls, jsonish: Union[str, bytes, Path, dict], **kwargs):
         if isinstance(jsonish, Path):
-            jsonish = jsonish.read_text()
-        if isinstance(jsonish, str):
-            jsonish = json.loads(jsonish)
-        return cls.from_dict(jsonish)
+            jsonish = jsonish.read_bytes()
+        if isinstance(jsonish, (str, bytes)):
+            jsonish = loads(jsonish)
+        return cls.from_dict(jsonish, **kwargs)
 
     def to_json(self):
         raise NotImplementedError
 
 
 class Model(JSONable):
+    __slots__ = ()
+
     @property
     def can_change(self):
         raise NotImplementedError
 
 
 class Report(JSONable):
+    __slots__ = ("metadata",)
+
     def __init__(self, metadata: JSONable):
         self.metadata = metadata
 
@@ -0,0 +1,174 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import requests
+from solana.exceptions import SolanaRpcException, handle_exceptions
+from solana.rpc.providers.http import HTTPProvider
+from solana.rpc.types import RPCMethod, RPCResponse
+
+from .constants import *
+from .schemas import HAS_MSGSPEC
+
+if HAS_MSGSPEC:
+    import msgspec
+
+    _raw_responses_decoder = msgspec.json.Decoder(
+        Union[List[Dict[str, msgspec.Raw]], Dict[str, msgspec.Raw]]
+    )
+
+
+class BatchNotSupportedError(Exception):
+    pass
+
+
+def get_block_config(encoding: str, commitment: Optional[str] = None):
+    # getBlock only takes a commitment inside its config object
+    if commitment is None:
+        return encoding
+    return {ENCODING: encoding, COMMITMENT: commitment}
+
+
+def order_responses(request_ids: List[int], responses: List[RPCResponse]):
+    # responses in a batch may come back in any order
+    responses = {response.get(ID): response for response in responses}
+    return [responses.get(request_id, {}) for request_id in request_ids]
+
+
+def decode_raw_responses(content: bytes):
+    # responses with their result left as the JSON bytes it came in, None for
+    # a null result, without decoding or encoding a large result again
+    if HAS_MSGSPEC:
+        responses = _raw_responses_decoder.decode(content)
+        if not isinstance(responses, list):
+            responses = [responses]
+        return [
+            {
+                key: (None if bytes(value) == b"null" else bytes(value))
+                if key == RESULT
+                else msgspec.json.decode(value)
+                for key, value in response.items()
+            }
+            for response in responses
+        ]
+
+    responses = json.loads(content)
+    if not isinstance(responses, list):
+        responses = [responses]
+    for response in responses:
+        if response.get(RESULT) is not None:
+            response[RESULT] = json.dumps(response[RESULT]).encode()
+    return responses
+
+
+class BatchHTTPProvider(HTTPProvider):
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        timeout: float = 10,
+        on_response: Optional[Callable[[int], None]] = None,
+    ):
+        super().__init__(endpoint, timeout=timeout)
+        # called with the size in bytes of every response body
+        self.on_response = on_response
+
+    def _after_request(self, raw_response, method: RPCMethod) -> RPCResponse:
+        if self.on_response is not None:
+            self.on_response(len(raw_response.content))
+        return super()._after_request(raw_response=raw_response, method=method)
+
+    def _post(self, method: RPCMethod, params_list: List[List[Any]], batch=True):
+        request_ids = [self._increment_counter_and_get_id() for _ in params_list]
+        requests_json = [
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            for request_id, params in zip(request_ids, params_list)
+        ]
+        raw_response = requests.post(
+            self.endpoint_uri,
+            headers={"Content-Type": "application/json"},
+            data=self.json_encode(requests_json if batch else requests_json[0]),
+            timeout=self.timeout,
+        )
+        raw_response.raise_for_status()
+        if self.on_response is not None:
+            self.on_response(len(raw_response.content))
+        return request_ids, raw_response
+
+    @handle_exceptions(SolanaRpcException, requests.exceptions.RequestException)
+    def make_batch_request(
+        self, method: RPCMethod, params_list: List[List[Any]]
+    ) -> List[RPCResponse]:
+        request_ids, raw_response = self._post(method, params_list)
+        responses = self.json_decode(raw_response.text)
+        if not isinstance(responses, list):
+            raise BatchNotSupportedError(
+                f"Batch requests not supported by {self.endpoint_uri}"
+            )
+        return order_responses(request_ids, responses)
+
+    @handle_exceptions(SolanaRpcException, requests.exceptions.RequestException)
+    def make_raw_request(
+        self, method: RPCMethod, params_list: List[List[Any]], batch=True
+    ) -> List[RPCResponse]:
+        # one request for each params, in a batch or alone for a single one
+        request_ids, raw_response = self._post(method, params_list, batch)
+        responses = decode_raw_responses(raw_response.content)
+        if batch and len(responses) == 1 and len(request_ids) > 1:
+            raise BatchNotSupportedError(
+                f"Batch requests not supported by {self.endpoint_uri}"
+            )
+        return order_responses(request_ids, responses)
+
+
+class BatchClient:
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        timeout: float = 10,
+        on_response: Optional[Callable[[int], None]] = None,
+    ):
+        self._provider = BatchHTTPProvider(
+            endpoint, timeout=timeout, on_response=on_response
+        )
+        # cleared once the endpoint turns a batch down
+        self.supports_batches = True
+
+    @classmethod
+    def from_client(cls, api_client, on_response=None):
+        return cls(
+            api_client._provider.endpoint_uri,
+            api_client._provider.timeout,
+            on_response=on_response,
+        )
+
+    def get_block(
+        self, slot: int, encoding: str = "json", commitment: Optional[str] = None
+    ) -> RPCResponse:
+        return self._provider.make_request(
+            RPCMethod("getBlock"), slot, get_block_config(encoding, commitment)
+        )
+
+    def get_block_batch(
+        self, slots: List[int], encoding: str = "json", commitment: Optional[str] = None
+    ) -> List[RPCResponse]:
+        config = get_block_config(encoding, commitment)
+        return self._provider.make_batch_request(
+            RPCMethod("getBlock"), [[slot, config] for slot in slots]
+        )
+
+    def get_block_raw(
+        self, slot: int, encoding: str = "json", commitment: Optional[str] = None
+    ) -> RPCResponse:
+        (response,) = self._provider.make_raw_request(
+            RPCMethod("getBlock"),
+            [[slot, get_block_config(encoding, commitment)]],
+            batch=False,
+        )
+        return response
+
+    def get_block_batch_raw(
+        self, slots: List[int], encoding: str = "json", commitment: Optional[str] = None
+    ) -> List[RPCResponse]:
+        config = get_block_config(encoding, commitment)
+        return self._provider.make_raw_request(
+            RPCMethod("getBlock"), [[slot, config] for slot in slots]
+        )
@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .file import get_leader_schedule_array_file, get_leader_schedule_file
+
+NO_LEADER = -1
+
+
+class LeaderSchedule:
+    def __init__(self, first_slot: int, pubkeys: List[str], leaders: np.ndarray):
+        # leaders[slot - first_slot] is the index of the slot leader in pubkeys
+        self.first_slot = first_slot
+        self.pubkeys = pubkeys
+        self.leaders = leaders
+
+    @classmethod
+    def from_dict(cls, schedule: Dict[str, List[int]]):
+        pubkeys = list(schedule)
+        slots = [np.asarray(schedule[pubkey], dtype=np.int64) for pubkey in pubkeys]
+        all_slots = np.concatenate(slots) if slots else np.zeros(0, dtype=np.int64)
+        if not len(all_slots):
+            return cls(0, pubkeys, np.zeros(0, dtype=np.int32))
+
+        first_slot = int(all_slots.min())
+        leaders = np.full(int(all_slots.max()) - first_slot + 1, NO_LEADER, np.int32)
+        for i, pubkey_slots in enumerate(slots):
+            leaders[pubkey_slots - first_slot] = i
+        return cls(first_slot, pubkeys, leaders)
+
+    @classmethod
+    def load(cls, schedule_file: Path):
+        with np.load(schedule_file) as schedule:
+            return cls(
+                int(schedule["first_slot"]),
+                schedule["pubkeys"].tolist(),
+                schedule["leaders"],
+            )
+
+    def save(self, schedule_file: Path):
+        tmp_file = schedule_file.with_name(f".{schedule_file.name}.tmp")
+        with open(tmp_file, "wb") as fp:
+            np.savez(
+                fp,
+                first_slot=self.first_slot,
+                pubkeys=np.array(self.pubkeys, dtype=str),
+                leaders=self.leaders,
+            )
+        os.replace(tmp_file, schedule_file)
+
+    def _offsets(self, slots: Iterable[int]):
+        offsets = np.fromiter(slots, dtype=np.int64) - self.first_slot
+        return offsets[(offsets >= 0) & (offsets < len(self.leaders))]
+
+    def leader(self, slot: int):
+        offset = slot - self.first_slot
+        if not 0 <= offset < len(self.leaders) or self.leaders[offset] == NO_LEADER:
+            return None
+        return self.pubkeys[self.leaders[offset]]
+
+    def counts(self, slots: Optional[Iterable[int]] = None):
+        # number of leader slots of every pubkey, in the order of pubkeys
+        leaders = self.leaders if slots is None else self.leaders[self._offsets(slots)]
+        leaders = leaders[leaders != NO_LEADER]
+        return np.bincount(leaders, minlength=len(self.pubkeys))
+
+    def missed(self, slots: Iterable[int], skipped_slots: Iterable[int]):
+        slots = np.fromiter(slots, dtype=np.int64)
+        skipped_slots = np.fromiter(skipped_slots, dtype=np.int64)
+        return self.counts(slots[np.isin(slots, skipped_slots)])
+
+
+def load_leader_schedule(data_dir: Path, epoch: int):
+    # schedules dumped as JSON only are converted the first time they are read
+    schedule_file = get_leader_schedule_array_file(data_dir, epoch)
+    if schedule_file.exists():
+        return LeaderSchedule.load(schedule_file)
+
+    schedule = LeaderSchedule.from_dict(
+        json.loads(get_leader_schedule_file(data_dir, epoch).read_text())
+    )
+    schedule.save(schedule_file)
+    return schedule
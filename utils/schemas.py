@@ -0,0 +1,211 @@
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, TypedDict
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+from .constants import *
+from .objects import intern_key, project_fields
+
+# With msgspec installed, block files are decoded straight into typed structs
+# with the same attributes as the models in models.py. Nested lists left out of
+# a field projection are kept as raw JSON and decoded the first time they are
+# accessed, like the lazy models. Raw blocks are decoded into dicts holding
+# only the getBlock keys the projection needs, the others are skipped.
+HAS_MSGSPEC = msgspec is not None
+
+
+def _nested_field(name: str, item_type, eager: bool):
+    if eager:
+        return (name, List[item_type])
+    return (f"raw_{name}", msgspec.Raw, msgspec.field(name=name))
+
+
+if HAS_MSGSPEC:
+
+    class _Struct(msgspec.Struct, kw_only=True):
+        def _hydrate(self, name: str, item_type):
+            value = getattr(self, f"raw_{name}")
+            if isinstance(value, msgspec.Raw):
+                value = msgspec.json.decode(value, type=List[item_type])
+                setattr(self, f"raw_{name}", value)
+            return value
+
+        def to_json(self):
+            return msgspec.json.decode(msgspec.json.encode(self))
+
+    class AccountTransactionStruct(_Struct):
+        pubkey: Optional[str] = None
+        transaction_id: Optional[str] = None
+        pre_balance: Optional[int] = None
+        post_balance: Optional[int] = None
+        read_only: Optional[bool] = None
+        signed: Optional[bool] = None
+        signature: Optional[str] = None
+
+        def __post_init__(self):
+            self.pubkey = intern_key(self.pubkey)
+
+        @property
+        def _id(self):
+            return (self.transaction_id, self.pubkey)
+
+    class InstructionTransactionStruct(_Struct):
+        accounts: Any = None
+        data: Any = None
+        program_account: Any = None
+        program_name: Optional[str] = None
+
+        def __post_init__(self):
+            self.program_account = intern_key(self.program_account)
+
+    class _TransactionStruct(_Struct):
+        @property
+        def _id(self):
+            return self.signatures[0]
+
+        @property
+        def transaction_accounts(self):
+            return self._hydrate("transaction_accounts", AccountTransactionStruct)
+
+        @property
+        def transaction_instructions(self):
+            return self._hydrate(
+                "transaction_instructions", InstructionTransactionStruct
+            )
+
+    class _BlockStruct(_Struct):
+        @property
+        def _id(self):
+            return self.slot
+
+        @property
+        def transactions(self):
+            return self._hydrate("transactions", transaction_struct(None))
+
+        @property
+        def can_change(self):
+            return self.commitment != FINALIZED
+
+
+@lru_cache(maxsize=None)
+def transaction_struct(fields: Optional[FrozenSet[str]]):
+    accounts_eager, _ = project_fields(fields, "transaction_accounts")
+    instructions_eager, _ = project_fields(fields, "transaction_instructions")
+    return msgspec.defstruct(
+        "TransactionStruct",
+        [
+            ("signatures", List[str]),
+            ("block", Optional[int], None),
+            ("err", Any, None),
+            ("fee", Optional[int], None),
+            ("rewards", Any, None),
+            _nested_field(
+                "transaction_accounts", AccountTransactionStruct, accounts_eager
+            ),
+            _nested_field(
+                "transaction_instructions",
+                InstructionTransactionStruct,
+                instructions_eager,
+            ),
+        ],
+        bases=(_TransactionStruct,),
+        kw_only=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def block_struct(fields: Optional[FrozenSet[str]]):
+    eager, transactions_fields = project_fields(fields, "transactions")
+    if transactions_fields is not None:
+        transactions_fields = frozenset(transactions_fields)
+    return msgspec.defstruct(
+        "BlockStruct",
+        [
+            ("slot", int),
+            ("commitment", str),
+            ("blockhash", Optional[str], None),
+            ("previous_blockhash", Optional[str], None),
+            ("parent_slot", Optional[int], None),
+            ("rewards", List[Dict[str, Any]], msgspec.field(default_factory=list)),
+            ("block_time", Optional[int], None),
+            ("block_height", Optional[int], None),
+            ("signatures", List[str], msgspec.field(default_factory=list)),
+            _nested_field(
+                "transactions", transaction_struct(transactions_fields), eager
+            ),
+        ],
+        bases=(_BlockStruct,),
+        kw_only=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def _block_decoder(fields: Optional[FrozenSet[str]]):
+    return msgspec.json.Decoder(block_struct(fields))
+
+
+def decode_block(data: bytes, fields=None):
+    if fields is not None:
+        fields = frozenset(fields)
+    return _block_decoder(fields).decode(data)
+
+
+@lru_cache(maxsize=None)
+def raw_block_type(fields: Optional[FrozenSet[str]]):
+    eager, transactions_fields = project_fields(fields, "transactions")
+    accounts_eager, _ = project_fields(transactions_fields, "transaction_accounts")
+    instructions_eager, _ = project_fields(
+        transactions_fields, "transaction_instructions"
+    )
+    message = {}
+    meta = {ERR: Any, FEE: Any, REWARDS: Any}
+    if accounts_eager or instructions_eager:
+        message[ACCOUNT_KEYS] = Any
+    if accounts_eager:
+        meta[PRE_BALANCES] = Any
+        meta[POST_BALANCES] = Any
+    if instructions_eager:
+        message[INSTRUCTIONS] = Any
+    transaction = {
+        TRANSACTION: TypedDict(
+            "RpcTransactionBody",
+            {
+                SIGNATURES: List[str],
+                MESSAGE: TypedDict("RpcMessage", message, total=False),
+            },
+            total=False,
+        ),
+        META: TypedDict("RpcMeta", meta, total=False),
+    }
+
+    block = {
+        BLOCKHASH: Any,
+        PREVIOUS_BLOCKHASH: Any,
+        PARENT_SLOT: Any,
+        BLOCK_TIME: Any,
+        BLOCK_HEIGHT: Any,
+        REWARDS: Any,
+    }
+    if eager:
+        block[TRANSACTIONS] = List[
+            TypedDict("RpcTransaction", transaction, total=False)
+        ]
+    return TypedDict(
+        "RawBlock",
+        {SLOT: int, COMMITMENT: str, BLOCK: TypedDict("RpcBlock", block, total=False)},
+        total=False,
+    )
+
+
+@lru_cache(maxsize=None)
+def _raw_block_decoder(fields: Optional[FrozenSet[str]]):
+    return msgspec.json.Decoder(raw_block_type(fields))
+
+
+def decode_raw_block(data: bytes, fields=None):
+    if fields is not None:
+        fields = frozenset(fields)
+    return _raw_block_decoder(fields).decode(data)
@@ -0,0 +1,119 @@
+import gzip
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD = b"ZSTD"
+GZIP = b"GZIP"
+
+# every segment packs the blocks of this many consecutive slots
+SEGMENT_SLOTS = 10000
+
+# a segment is the compressed blocks one after the other, followed by the
+# index (slot, offset, length for every block, as int64) and a footer with
+# the number of blocks and the codec used
+FOOTER = struct.Struct("<q4s")
+
+
+def get_segments_dir(data_dir: Path, epoch: int):
+    return data_dir / str(epoch) / "segments"
+
+
+def get_segment_name(first_slot: int, segment_slots: int = SEGMENT_SLOTS):
+    first_slot = first_slot - first_slot % segment_slots
+    return f"{first_slot}-{first_slot + segment_slots - 1}.seg"
+
+
+def _compress(codec: bytes, data: bytes):
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def _decompress(codec: bytes, data: bytes):
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd segments")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class SegmentWriter:
+    def __init__(self, segment_file: Path, codec: Optional[bytes] = None):
+        if codec is None:
+            codec = GZIP if zstandard is None else ZSTD
+        self.segment_file = segment_file
+        self.codec = codec
+        self._tmp_file = segment_file.with_name(f".{segment_file.name}.tmp")
+        self._fp = open(self._tmp_file, "wb")
+        self._index = []
+        self._offset = 0
+
+    def add(self, slot: int, block_bytes: bytes):
+        frame = _compress(self.codec, block_bytes)
+        self._fp.write(frame)
+        self._index.append((slot, self._offset, len(frame)))
+        self._offset += len(frame)
+
+    def close(self):
+        index = np.array(sorted(self._index), dtype=np.int64).reshape(-1, 3)
+        self._fp.write(index.tobytes())
+        self._fp.write(FOOTER.pack(len(index), self.codec))
+        self._fp.close()
+        os.replace(self._tmp_file, self.segment_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Segment:
+    def __init__(self, segment_file: Path):
+        self.segment_file = segment_file
+        self._stat = segment_file.stat()
+        with open(segment_file, "rb") as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        n_blocks, self.codec = FOOTER.unpack_from(
+            self._mmap, len(self._mmap) - FOOTER.size
+        )
+        index_offset = len(self._mmap) - FOOTER.size - n_blocks * 3 * 8
+        index = np.frombuffer(
+            self._mmap, dtype=np.int64, count=n_blocks * 3, offset=index_offset
+        ).reshape(-1, 3)
+        self.slots, self._offsets, self._lengths = index.T
+
+    def _position(self, slot: int):
+        position = np.searchsorted(self.slots, slot)
+        if position < len(self.slots) and self.slots[position] == slot:
+            return position
+        return None
+
+    def __contains__(self, slot: int):
+        return self._position(slot) is not None
+
+    def fingerprint(self, slot: int):
+        position = self._position(slot)
+        if position is None:
+            raise KeyError(slot)
+        stat = self._stat
+        return f"{stat.st_size}-{stat.st_mtime_ns}-{self._offsets[position]}"
+
+    def read(self, slot: int):
+        position = self._position(slot)
+        if position is None:
+            raise KeyError(slot)
+        offset = self._offsets[position]
+        frame = self._mmap[offset : offset + self._lengths[position]]
+        return _decompress(self.codec, frame)
@@ -0,0 +1,239 @@
+import random
+from typing import Dict, List
+
+from .constants import *
+
+# Deterministic, RPC shaped data of a made up cluster: every block is generated
+# from the seed and its slot alone, so a block looks the same however many
+# times or in whatever order it is asked for.
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+SYSTEM_PROGRAM_ACCOUNT = "11111111111111111111111111111111"
+GENESIS_TIME = 1600000000
+SLOT_TIME = 0.4
+# consecutive slots every leader is scheduled for
+LEADER_SLOTS = 4
+
+
+def random_pubkey(rng: random.Random, length: int = 44):
+    return "".join(rng.choices(BASE58_ALPHABET, k=length))
+
+
+class SyntheticCluster:
+    def __init__(
+        self,
+        seed: int = 0,
+        validators: int = 100,
+        transactions: int = 200,
+        vote_share: float = 0.7,
+        skip_rate: float = 0.05,
+        fail_rate: float = 0.05,
+        rent_share: float = 0.3,
+        slots_per_epoch: int = 432000,
+    ):
+        self.seed = seed
+        self.transactions = transactions
+        self.vote_share = vote_share
+        self.skip_rate = skip_rate
+        self.fail_rate = fail_rate
+        self.rent_share = rent_share
+        self.slots_per_epoch = slots_per_epoch
+
+        rng = random.Random(f"{seed}-validators")
+        self.validators = [random_pubkey(rng) for _ in range(validators)]
+        self.vote_accounts = [random_pubkey(rng) for _ in range(validators)]
+        self.stakes = [rng.paretovariate(1.2) for _ in range(validators)]
+        # most validators vote one or two slots behind, a few lag far behind
+        self.vote_lags = [
+            rng.randint(8, 32) if rng.random() < 0.05 else rng.randint(1, 2)
+            for _ in range(validators)
+        ]
+        self.accounts = [random_pubkey(rng) for _ in range(10 * validators)]
+
+    def _rng(self, *key):
+        return random.Random("-".join(str(part) for part in (self.seed, *key)))
+
+    def get_epoch_schedule(self):
+        return {
+            FIRST_NORMAL_EPOCH: 0,
+            FIRST_NORMAL_SLOT: 0,
+            SLOTS_PER_EPOCH: self.slots_per_epoch,
+        }
+
+    def get_epoch(self, slot: int):
+        return slot // self.slots_per_epoch
+
+    def is_skipped(self, slot: int):
+        return self._rng(slot, "skipped").random() < self.skip_rate
+
+    def get_leader_schedule(self, epoch: int):
+        # leader slot offsets in the epoch by leader, like getLeaderSchedule
+        rng = self._rng(epoch, "leaders")
+        schedule: Dict[str, List[int]] = {}
+        for offset in range(0, self.slots_per_epoch, LEADER_SLOTS):
+            leader = rng.choices(self.validators, weights=self.stakes)[0]
+            schedule.setdefault(leader, []).extend(
+                range(offset, min(offset + LEADER_SLOTS, self.slots_per_epoch))
+            )
+        return schedule
+
+    def _vote_transaction(self, rng: random.Random, slot: int, validator: int):
+        authority = self.validators[validator]
+        vote_account = self.vote_accounts[validator]
+        voted_slot = slot - self.vote_lags[validator]
+        return {
+            META: {
+                ERR: None,
+                FEE: 5000,
+                PRE_BALANCES: [rng.randint(10**9, 10**11), 10**7, 1],
+                POST_BALANCES: [rng.randint(10**9, 10**11), 10**7, 1],
+                REWARDS: [],
+            },
+            TRANSACTION: {
+                SIGNATURES: [random_pubkey(rng, 88)],
+                MESSAGE: {
+                    ACCOUNT_KEYS: [
+                        {PUBKEY: authority, SIGNER: True, WRITABLE: True},
+                        {PUBKEY: vote_account, SIGNER: False, WRITABLE: True},
+                        {PUBKEY: VOTE_PROGRAM_ACCOUNT, SIGNER: False, WRITABLE: False},
+                    ],
+                    INSTRUCTIONS: [
+                        {
+                            PROGRAM: VOTE,
+                            PROGRAM_ID: VOTE_PROGRAM_ACCOUNT,
+                            PARSED: {
+                                TYPE: VOTE,
+                                INFO: {
+                                    VOTE_ACCOUNT: vote_account,
+                                    VOTE_AUTHORITY: authority,
+                                    VOTE: {
+                                        HASH: random_pubkey(rng),
+                                        SLOTS: [voted_slot - 1, voted_slot],
+                                        TIMESTAMP: None,
+                                    },
+                                },
+                            },
+                        }
+                    ],
+                },
+            },
+        }
+
+    def _transfer_transaction(self, rng: random.Random):
+        source, destination, other = rng.sample(self.accounts, 3)
+        amount = rng.randint(1, 10**9)
+        source_balance = rng.randint(amount + 5000, 10**12)
+        destination_balance = rng.randint(0, 10**12)
+        failed = rng.random() < self.fail_rate
+        return {
+            META: {
+                ERR: {"InstructionError": [1, "Custom"]} if failed else None,
+                FEE: 5000,
+                PRE_BALANCES: [source_balance, destination_balance, 10**7, 1, 1],
+                POST_BALANCES: [
+                    source_balance - 5000 - (0 if failed else amount),
+                    destination_balance + (0 if failed else amount),
+                    10**7,
+                    1,
+                    1,
+                ],
+                REWARDS: [],
+            },
+            TRANSACTION: {
+                SIGNATURES: [random_pubkey(rng, 88)],
+                MESSAGE: {
+                    ACCOUNT_KEYS: [
+                        {PUBKEY: source, SIGNER: True, WRITABLE: True},
+                        {PUBKEY: destination, SIGNER: False, WRITABLE: True},
+                        {PUBKEY: other, SIGNER: False, WRITABLE: True},
+                        {
+                            PUBKEY: SYSTEM_PROGRAM_ACCOUNT,
+                            SIGNER: False,
+                            WRITABLE: False,
+                        },
+                        {PUBKEY: self.accounts[0], SIGNER: False, WRITABLE: False},
+                    ],
+                    INSTRUCTIONS: [
+                        {
+                            PROGRAM: "system",
+                            PROGRAM_ID: SYSTEM_PROGRAM_ACCOUNT,
+                            PARSED: {
+                                TYPE: "transfer",
+                                INFO: {
+                                    "destination": destination,
+                                    LAMPORTS: amount,
+                                    "source": source,
+                                },
+                            },
+                        },
+                        {
+                            PROGRAM_ID: self.accounts[0],
+                            ACCOUNTS: [source, other],
+                            DATA: random_pubkey(rng, rng.randint(8, 64)),
+                        },
+                    ],
+                },
+            },
+        }
+
+    def get_block(self, slot: int):
+        # the getBlock result of a produced slot, in jsonParsed encoding
+        rng = self._rng(slot)
+        n_transactions = max(
+            0, int(rng.gauss(self.transactions, self.transactions / 5))
+        )
+        n_votes = int(n_transactions * self.vote_share)
+
+        voters = rng.sample(
+            range(len(self.validators)), min(n_votes, len(self.validators))
+        )
+        transactions = [
+            self._vote_transaction(rng, slot, validator) for validator in voters
+        ]
+        transactions += [
+            self._transfer_transaction(rng)
+            for _ in range(n_transactions - len(transactions))
+        ]
+        rng.shuffle(transactions)
+
+        # only some blocks collect rent, mostly from a few accounts
+        n_rent = rng.randint(1, 10) if rng.random() < self.rent_share else 0
+        rewards = [
+            {
+                PUBKEY: rng.choice(self.accounts),
+                LAMPORTS: -rng.randint(1, 10**5) if rng.random() < 0.9 else 1,
+                POST_BALANCE: rng.randint(0, 10**12),
+                REWARD_TYPE: RENT,
+                COMMISSION: None,
+            }
+            for _ in range(n_rent)
+        ]
+        rewards.append(
+            {
+                PUBKEY: rng.choice(self.validators),
+                LAMPORTS: 5000 * n_transactions // 2,
+                POST_BALANCE: rng.randint(10**9, 10**12),
+                REWARD_TYPE: "Fee",
+                COMMISSION: None,
+            }
+        )
+
+        parent_slot = self.get_parent_slot(slot)
+        return {
+            BLOCKHASH: self.get_blockhash(slot),
+            PREVIOUS_BLOCKHASH: self.get_blockhash(parent_slot),
+            PARENT_SLOT: parent_slot,
+            BLOCK_TIME: int(GENESIS_TIME + slot * SLOT_TIME),
+            BLOCK_HEIGHT: slot,
+            REWARDS: rewards,
+            TRANSACTIONS: transactions,
+        }
+
+    def get_parent_slot(self, slot: int):
+        parent_slot = slot - 1
+        while parent_slot > 0 and self.is_skipped(parent_slot):
+            parent_slot -= 1
+        return parent_slot
+
+    def get_blockhash(self, slot: int):
+        return random_pubkey(self._rng(slot, "blockhash"))
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from models import VoteInstruction
+from reader import BlockReader
+from utils.constants import *
+from utils.file import get_vote_table_file, get_vote_table_index_file
+from utils.manifest import load_manifest
+
+# The vote table of an epoch has one line per block with the successful Vote
+# program votes included in it, so vote analytics never touch the blocks. The
+# table covers the slots it has a line for, dumps and indexing of part of an
+# epoch leave the others out. An index of the offset of every line, kept up
+# to date with the appended lines, lets a slot range read only its lines.
+
+SLOT_PREFIX = b'{"slot": '
+
+
+def extract_vote_instructions(block):
+    return [
+        VoteInstruction(
+            vote_authority=info[VOTE_AUTHORITY],
+            vote_account=info.get(VOTE_ACCOUNT),
+            hash=info[VOTE].get(HASH),
+            timestamp=info[VOTE].get(TIMESTAMP),
+            slots=info[VOTE][SLOTS],
+            slot=block.slot,
+        )
+        for info in [
+            tr_inst.data[INFO]
+            for tr in block.transactions
+            for tr_inst in tr.transaction_instructions
+            if tr.err is None
+            and tr_inst.program_account == VOTE_PROGRAM_ACCOUNT
+            and tr_inst.data[TYPE] == VOTE
+        ]
+    ]
+
+
+class VoteTableWriter:
+    def __init__(self, vote_table_file: Path):
+        self._fp = open(vote_table_file, "a")
+        self._lock = threading.Lock()
+
+    def add(self, slot: int, votes: List[VoteInstruction]):
+        line = json.dumps({SLOT: slot, VOTES: [vote.to_json() for vote in votes]})
+        with self._lock:
+            self._fp.write(line + "\n")
+            self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def has_vote_table(data_dir: Path, epoch: int):
+    return get_vote_table_file(data_dir, epoch).exists()
+
+
+def _scan_vote_table(fp, offset: int):
+    # (slot, offset, length) of every complete line from the offset, with the
+    # offset past the last one
+    fp.seek(offset)
+    rows = []
+    for line in fp:
+        if not line.endswith(b"\n"):
+            # cut short if the dumper crashed, or still being written
+            break
+        if line.startswith(SLOT_PREFIX):
+            slot = int(line[len(SLOT_PREFIX) : line.index(b",")])
+            rows.append((slot, offset, len(line)))
+        offset += len(line)
+    return np.array(rows, dtype=np.int64).reshape(-1, 3), offset
+
+
+def load_vote_table_index(data_dir: Path, epoch: int):
+    # the slots of the table, sorted, with the offset and length of their line
+    vote_table_file = get_vote_table_file(data_dir, epoch)
+    index_file = get_vote_table_index_file(data_dir, epoch)
+    stat = vote_table_file.stat()
+    rows, scanned = np.zeros((0, 3), dtype=np.int64), 0
+    if index_file.exists():
+        with np.load(index_file) as index:
+            # a table rewritten in place of the indexed one is a new file
+            if int(index["inode"]) == stat.st_ino and index["scanned"] <= stat.st_size:
+                rows, scanned = index["rows"], int(index["scanned"])
+
+    if scanned < stat.st_size:
+        with open(vote_table_file, "rb") as fp:
+            new_rows, scanned = _scan_vote_table(fp, scanned)
+        # a block dumped again replaces its earlier votes
+        rows = np.concatenate([rows, new_rows])
+        _, last = np.unique(rows[::-1, 0], return_index=True)
+        rows = rows[len(rows) - 1 - last]
+        try:
+            tmp_file = index_file.with_name(f".{index_file.name}.{os.getpid()}.tmp")
+            with open(tmp_file, "wb") as fp:
+                np.savez(fp, inode=stat.st_ino, scanned=scanned, rows=rows)
+            os.replace(tmp_file, index_file)
+        except OSError:
+            # a read only data dir goes without the index
+            pass
+    return rows
+
+
+def read_vote_table(data_dir: Path, epoch: int, slot_range: Optional[List[int]] = None):
+    rows = load_vote_table_index(data_dir, epoch)
+    if slot_range is not None and not slot_range:
+        rows = rows[:0]
+    elif slot_range is not None:
+        low, up = np.searchsorted(rows[:, 0], [min(slot_range), max(slot_range) + 1])
+        rows = rows[low:up]
+
+    vote_table = {}
+    with open(get_vote_table_file(data_dir, epoch), "rb") as fp:
+        for slot, offset, length in rows.tolist():
+            fp.seek(offset)
+            try:
+                row = json.loads(fp.read(length))
+            except ValueError:
+                # a line cut short by a crash, with the next one written after it
+                continue
+            vote_table[slot] = [VoteInstruction.from_dict(vote) for vote in row[VOTES]]
+    return vote_table
+
+
+def read_covering_vote_table(data_dir: Path, epoch: int, slot_range: List[int]):
+    # the table of the blocks on disk, if it has a line for each one in the range
+    if not has_vote_table(data_dir, epoch) or not slot_range:
+        return None
+    manifest = load_manifest(data_dir, epoch)
+    present = set(slot_range) - manifest.missing(slot_range)
+    slots = load_vote_table_index(data_dir, epoch)[:, 0]
+    if not np.isin(np.fromiter(present, dtype=np.int64), slots).all():
+        return None
+    vote_table = read_vote_table(data_dir, epoch, slot_range)
+    # lines of blocks deleted since, like those of abandoned forks, are stale
+    return {slot: votes for slot, votes in vote_table.items() if slot in present}
+
+
+def index_votes(data_dir: Path, epoch: int, slot_range: List[int]):
+    # lines are appended, the table keeps covering the slots indexed before
+    reader = BlockReader(data_dir, epoch)
+    fields = {"transactions.err", "transactions.transaction_instructions"}
+    with VoteTableWriter(get_vote_table_file(data_dir, epoch)) as vote_table:
+        for slot in tqdm(slot_range):
+            if reader.exists(slot):
+                block = reader.read(slot, fields)
+                vote_table.add(slot, extract_vote_instructions(block))
+
+
+if __name__ == "__main__":
+    CLI = argparse.ArgumentParser()
+    CLI.add_argument("--data-dir", type=str, required=True)
+    CLI.add_argument("--epoch", type=int, required=True)
+    CLI.add_argument(
+        "--slot-range",
+        nargs=2,
+        type=int,
+        required=True,
+    )
+
+    # parse the command line
+    args = CLI.parse_args()
+
+    index_votes(Path(args.data_dir), args.epoch, list(range(*args.slot_range)))